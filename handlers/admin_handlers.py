@@ -3,8 +3,10 @@ Admin handlers for bot administration
 Handles order management, product management, statistics, and broadcasts
 """
 
-from telegram import Update
+from telegram import MessageEntity, Update
+from telegram.error import Forbidden, RetryAfter
 from telegram.ext import (
+    Application,
     ContextTypes,
     CommandHandler,
     MessageHandler,
@@ -13,14 +15,17 @@ from telegram.ext import (
     filters
 )
 
-import os
-import sys
-import yaml
-
-# Add parent directory to path for imports
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-from utils.data_manager import DataManager
+import asyncio
+import heapq
+import re
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Dict, Optional
+
+from handlers.order_handlers import enqueue_notification, html_escape
+from utils.config import get_admin_ids
+from utils.data_manager import get_data_manager
 from utils.keyboards import (
     get_admin_menu_keyboard,
     get_main_menu_keyboard,
@@ -28,8 +33,9 @@ from utils.keyboards import (
     get_admin_order_status_keyboard,
     get_admin_product_list_keyboard,
     get_admin_product_actions_keyboard,
-    get_status_emoji,
-    get_status_text
+    get_status_text,
+    STATUS_VIEWS,
+    UNKNOWN_STATUS_VIEW
 )
 
 # Conversation states
@@ -38,21 +44,95 @@ ADMIN_WAITING_DESC = 11
 ADMIN_WAITING_BROADCAST = 12
 ADMIN_ADDING_PRODUCT = 13
 
-# Initialize data manager
-data_manager = DataManager()
-
-
-def load_config():
-    """Load bot configuration"""
-    with open('config.yaml', 'r', encoding='utf-8') as f:
-        return yaml.safe_load(f)
+PAYMENT_METHODS = MappingProxyType({
+    'cash': 'Наличные',
+    'card_on_delivery': 'Карта курьеру',
+    'online': 'Онлайн'
+})
+
+# Customer-facing messages sent on status change
+STATUS_MESSAGES = MappingProxyType({
+    'accepted': 'Ваш заказ принят и скоро начнёт готовиться! 👨‍🍳',
+    'preparing': 'Ваш заказ готовится. Уже скоро! 🍣',
+    'on_the_way': 'Курьер уже в пути! Ждите доставку! 🚗',
+    'delivered': 'Заказ доставлен! Приятного аппетита! 🎉',
+    'cancelled': 'К сожалению, ваш заказ был отменён. Свяжитесь с нами для уточнения.'
+})
+
+# Shared data manager; handlers await its I/O through data_manager.aio
+data_manager = get_data_manager()
+
+# Admin reply keyboard is static; markups are immutable so one instance is shared
+_ADMIN_MENU_KB = get_admin_menu_keyboard()
+
+# Max concurrent sends during a broadcast (Telegram allows ~30 messages per second)
+BROADCAST_CONCURRENCY = 25
+# Recipients per checkpoint of a persisted broadcast
+BROADCAST_BATCH = 100
+_resumed_broadcast = None
+# Characters that make a broadcast worth sending with parse_mode='Markdown'
+MARKDOWN_CHARS = '*_[`'
+# Broadcast header; entity offsets and lengths count UTF-16 code units
+BROADCAST_TITLE = "Рассылка"
+_BROADCAST_PREFIX = "📢 "
+_BROADCAST_TITLE_ENTITIES = (MessageEntity(
+    MessageEntity.BOLD,
+    offset=len(_BROADCAST_PREFIX.encode('utf-16-le')) // 2,
+    length=len(BROADCAST_TITLE.encode('utf-16-le')) // 2
+),)
+
+# Callback data parsers
+_RE_TRAILING_ID = re.compile(r'_(\d+)$')
+_RE_SET_STATUS = re.compile(r'^set_status_(\d+)_(\w+)$')
+_RE_TOGGLE_PRODUCT = re.compile(r'^admin_(hide|show)_(\d+)$')
+
+# Rendered admin order details, least recently viewed first.
+# Only status changes after creation, so (id, status, created_at) identifies the text.
+ORDER_TEXT_CACHE_SIZE = 256
+_order_texts = OrderedDict()
+
+# Short-lived snapshots of full-table reads: {filename: (version, loaded_at, value)}
+SNAPSHOT_TTL = 5.0
+_snapshots = {}
+# (catalog version, product count, keyboard) of the admin product list
+_product_list_view: Optional[tuple] = None
 
 
 def is_admin(user_id: int) -> bool:
     """Check if user is an admin"""
-    config = load_config()
-    admin_ids = config.get('bot', {}).get('admin_ids', [])
-    return user_id in admin_ids
+    return user_id in get_admin_ids()
+
+
+def ack(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Answer the callback query in the background so the handler doesn't wait for the round-trip"""
+    return context.application.create_task(update.callback_query.answer(), update=update)
+
+
+async def _cached(filename: str, loader):
+    """Reuse awaited loader() result while the data file is unchanged and the snapshot is fresh"""
+    version = data_manager.get_version(filename)
+    now = time.monotonic()
+    snapshot = _snapshots.get(filename)
+    if snapshot and snapshot[0] == version and now - snapshot[1] < SNAPSHOT_TTL:
+        return snapshot[2]
+    value = await loader()
+    _snapshots[filename] = (version, now, value)
+    return value
+
+
+async def get_product_list_view() -> tuple:
+    """Product count and admin product list keyboard, rebuilt only when products.yaml changes (hand edits included)"""
+    global _product_list_view
+    stamp = data_manager.catalog_version
+    if _product_list_view is None or _product_list_view[0] != stamp:
+        products = await data_manager.aio.get_all_products()
+        _product_list_view = (stamp, len(products), get_admin_product_list_keyboard(products))
+    return _product_list_view[1:]
+
+
+async def get_all_users_cached() -> list:
+    """All users, memoized for rapid successive admin views"""
+    return await _cached('users.yaml', data_manager.aio.get_all_users)
 
 
 async def admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -63,7 +143,7 @@ async def admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     await update.message.reply_text(
         "👨‍💼 *Панель администратора*\n\nВыберите действие:",
-        reply_markup=get_admin_menu_keyboard(),
+        reply_markup=_ADMIN_MENU_KB,
         parse_mode='Markdown'
     )
 
@@ -73,7 +153,7 @@ async def admin_orders_handler(update: Update, context: ContextTypes.DEFAULT_TYP
     if not is_admin(update.effective_user.id):
         return
     
-    orders = data_manager.get_pending_orders()
+    orders = await data_manager.aio.get_pending_orders()
     
     if not orders:
         await update.message.reply_text(
@@ -91,58 +171,67 @@ async def admin_orders_handler(update: Update, context: ContextTypes.DEFAULT_TYP
     )
 
 
-async def admin_order_detail_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle admin order detail view"""
-    query = update.callback_query
-    
-    if not is_admin(update.effective_user.id):
-        await query.answer("❌ Доступ запрещён", show_alert=True)
-        return
-    
-    await query.answer()
+def render_admin_order(order: Dict) -> str:
+    """Admin order detail text (HTML), cached per (id, status, created_at)"""
+    key = (order['id'], order['status'], order['created_at'])
+    text = _order_texts.get(key)
+    if text is not None:
+        _order_texts.move_to_end(key)
+        return text
     
-    order_id = int(query.data.split('_')[-1])
-    order = data_manager.get_order(order_id)
-    
-    if not order:
-        await query.edit_message_text("❌ Заказ не найден")
-        return
-    
-    status_emoji = get_status_emoji(order['status'])
-    status_text = get_status_text(order['status'])
+    status_emoji, status_text = STATUS_VIEWS.get(order['status'], UNKNOWN_STATUS_VIEW)
     
     items_text = "\n".join([
-        f"  • {item['product_name']} x{item['quantity']} = {item['price'] * item['quantity']}₽"
+        f"  • {html_escape(item['product_name'])} x{item['quantity']} = {item['price'] * item['quantity']}₽"
         for item in order['items']
     ])
     
-    payment_methods = {
-        'cash': 'Наличные',
-        'card_on_delivery': 'Карта курьеру',
-        'online': 'Онлайн'
-    }
-    
     text = (
-        f"📦 *Заказ #{order['id']}*\n\n"
-        f"{status_emoji} Статус: *{status_text}*\n\n"
-        f"📋 *Товары:*\n{items_text}\n\n"
+        f"📦 <b>Заказ #{order['id']}</b>\n\n"
+        f"{status_emoji} Статус: <b>{status_text}</b>\n\n"
+        f"📋 <b>Товары:</b>\n{items_text}\n\n"
         f"💵 Сумма товаров: {order.get('subtotal', order['total'])}₽\n"
         f"🚗 Доставка: {order.get('delivery_cost', 0)}₽\n"
         f"🎟 Скидка: {order.get('discount', 0)}₽\n"
-        f"💰 *Итого: {order['total']}₽*\n\n"
-        f"📍 Адрес: {order['delivery_address']}\n"
-        f"📱 Телефон: {order['phone']}\n"
-        f"💳 Оплата: {payment_methods.get(order['payment_method'], order['payment_method'])}\n"
+        f"💰 <b>Итого: {order['total']}₽</b>\n\n"
+        f"📍 Адрес: {html_escape(order['delivery_address'])}\n"
+        f"📱 Телефон: {html_escape(order['phone'])}\n"
+        f"💳 Оплата: {PAYMENT_METHODS.get(order['payment_method'], order['payment_method'])}\n"
         f"📅 Создан: {order['created_at']}"
     )
     
     if order.get('comment'):
-        text += f"\n💬 Комментарий: {order['comment']}"
+        text += f"\n💬 Комментарий: {html_escape(order['comment'])}"
+    
+    _order_texts[key] = text
+    if len(_order_texts) > ORDER_TEXT_CACHE_SIZE:
+        _order_texts.popitem(last=False)
+    return text
+
+
+async def admin_order_detail_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle admin order detail view"""
+    query = update.callback_query
+    
+    if not is_admin(update.effective_user.id):
+        await query.answer("❌ Доступ запрещён", show_alert=True)
+        return
+    
+    ack(update, context)
+    
+    order_id = int(_RE_TRAILING_ID.search(query.data)[1])
+    order = await data_manager.aio.get_order(order_id)
+    
+    if not order:
+        await query.edit_message_text("❌ Заказ не найден")
+        return
+    
+    text = render_admin_order(order)
     
     await query.edit_message_text(
         text,
         reply_markup=get_admin_order_status_keyboard(order_id, order['status']),
-        parse_mode='Markdown'
+        parse_mode='HTML'
     )
 
 
@@ -155,26 +244,24 @@ async def set_order_status_callback(update: Update, context: ContextTypes.DEFAUL
         return
     
     # Parse: set_status_{order_id}_{status}
-    parts = query.data.split('_')
-    order_id = int(parts[2])
-    new_status = parts[3]
+    match = _RE_SET_STATUS.match(query.data)
+    order_id = int(match[1])
+    new_status = match[2]
     
-    order = data_manager.get_order(order_id)
+    order = await data_manager.aio.get_order(order_id)
     if not order:
         await query.answer("❌ Заказ не найден", show_alert=True)
         return
     
-    old_status = order['status']
-    data_manager.update_order_status(order_id, new_status)
+    orders = await data_manager.aio.update_order_status_and_get_pending(order_id, new_status)
     
     status_text = get_status_text(new_status)
     await query.answer(f"✅ Статус изменён на: {status_text}")
     
     # Notify customer
-    await notify_customer_status_change(context, order['user_id'], order_id, new_status)
+    notify_customer_status_change(context, order['user_id'], order_id, new_status)
     
     # Return to orders list
-    orders = data_manager.get_pending_orders()
     if orders:
         await query.edit_message_text(
             f"📋 *Активные заказы ({len(orders)})*\n\nВыберите заказ:",
@@ -188,42 +275,27 @@ async def set_order_status_callback(update: Update, context: ContextTypes.DEFAUL
         )
 
 
-async def notify_customer_status_change(context: ContextTypes.DEFAULT_TYPE, 
-                                        user_id: int, order_id: int, status: str):
+def notify_customer_status_change(context: ContextTypes.DEFAULT_TYPE, 
+                                  user_id: int, order_id: int, status: str):
     """Notify customer about order status change"""
-    status_emoji = get_status_emoji(status)
-    status_text = get_status_text(status)
-    
-    messages = {
-        'accepted': 'Ваш заказ принят и скоро начнёт готовиться! 👨‍🍳',
-        'preparing': 'Ваш заказ готовится. Уже скоро! 🍣',
-        'on_the_way': 'Курьер уже в пути! Ждите доставку! 🚗',
-        'delivered': 'Заказ доставлен! Приятного аппетита! 🎉',
-        'cancelled': 'К сожалению, ваш заказ был отменён. Свяжитесь с нами для уточнения.'
-    }
+    status_emoji, status_text = STATUS_VIEWS.get(status, UNKNOWN_STATUS_VIEW)
     
     text = (
-        f"{status_emoji} *Обновление заказа #{order_id}*\n\n"
-        f"Статус: *{status_text}*\n\n"
-        f"{messages.get(status, '')}"
+        f"{status_emoji} <b>Обновление заказа #{order_id}</b>\n\n"
+        f"Статус: <b>{status_text}</b>\n\n"
+        f"{STATUS_MESSAGES.get(status, '')}"
     )
     
-    try:
-        await context.bot.send_message(
-            chat_id=user_id,
-            text=text,
-            parse_mode='Markdown'
-        )
-    except Exception:
-        pass  # User might have blocked the bot
+    # Queued for the background sender, which spaces sends and retries on RetryAfter
+    enqueue_notification(context.bot, user_id, text)
 
 
 async def admin_back_to_orders_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle back to orders button in admin"""
     query = update.callback_query
-    await query.answer()
+    ack(update, context)
     
-    orders = data_manager.get_pending_orders()
+    orders = await data_manager.aio.get_pending_orders()
     
     if orders:
         await query.edit_message_text(
@@ -243,23 +315,12 @@ async def admin_statistics_handler(update: Update, context: ContextTypes.DEFAULT
     if not is_admin(update.effective_user.id):
         return
     
-    stats = data_manager.get_statistics()
-    all_orders = data_manager.get_all_orders()
-    users = data_manager.get_all_users()
-    
-    # Count orders by status
-    status_counts = {}
-    for order in all_orders:
-        status = order['status']
-        status_counts[status] = status_counts.get(status, 0) + 1
+    stats = await data_manager.aio.get_statistics()
+    users = await get_all_users_cached()
+    status_counts = await data_manager.aio.get_status_counts()
+    today = await data_manager.aio.get_today_totals()
     
-    # Today's orders
-    from datetime import datetime, timedelta
-    today = datetime.now().strftime('%Y-%m-%d')
-    today_orders = [o for o in all_orders if o['created_at'].startswith(today)]
-    today_revenue = sum(o['total'] for o in today_orders)
-    
-    text = (
+    parts = [
         "📊 *Статистика*\n\n"
         f"📦 *Всего заказов:* {stats.get('total_orders', 0)}\n"
         f"💰 *Общая выручка:* {stats.get('total_revenue', 0):.0f}₽\n"
@@ -267,18 +328,17 @@ async def admin_statistics_handler(update: Update, context: ContextTypes.DEFAULT
         f"👥 *Пользователей:* {len(users)}\n\n"
         
         f"📅 *Сегодня:*\n"
-        f"  • Заказов: {len(today_orders)}\n"
-        f"  • Выручка: {today_revenue:.0f}₽\n\n"
+        f"  • Заказов: {today['orders']}\n"
+        f"  • Выручка: {today['revenue']:.0f}₽\n\n"
         
         f"📋 *По статусам:*\n"
-    )
+    ]
     
     for status, count in status_counts.items():
-        emoji = get_status_emoji(status)
-        status_name = get_status_text(status)
-        text += f"  {emoji} {status_name}: {count}\n"
+        emoji, status_name = STATUS_VIEWS.get(status, UNKNOWN_STATUS_VIEW)
+        parts.append(f"  {emoji} {status_name}: {count}\n")
     
-    await update.message.reply_text(text, parse_mode='Markdown')
+    await update.message.reply_text("".join(parts), parse_mode='Markdown')
 
 
 async def admin_products_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -286,13 +346,13 @@ async def admin_products_handler(update: Update, context: ContextTypes.DEFAULT_T
     if not is_admin(update.effective_user.id):
         return
     
-    products = data_manager.get_all_products()
+    count, keyboard = await get_product_list_view()
     
-    text = f"🍣 *Управление меню*\n\nТоваров: {len(products)}\nВыберите товар для редактирования:"
+    text = f"🍣 *Управление меню*\n\nТоваров: {count}\nВыберите товар для редактирования:"
     
     await update.message.reply_text(
         text,
-        reply_markup=get_admin_product_list_keyboard(products),
+        reply_markup=keyboard,
         parse_mode='Markdown'
     )
 
@@ -305,13 +365,13 @@ async def admin_products_callback(update: Update, context: ContextTypes.DEFAULT_
         await query.answer("❌ Доступ запрещён", show_alert=True)
         return
     
-    await query.answer()
+    ack(update, context)
     
-    products = data_manager.get_all_products()
+    count, keyboard = await get_product_list_view()
     
     await query.edit_message_text(
-        f"🍣 *Управление меню*\n\nТоваров: {len(products)}\nВыберите товар:",
-        reply_markup=get_admin_product_list_keyboard(products),
+        f"🍣 *Управление меню*\n\nТоваров: {count}\nВыберите товар:",
+        reply_markup=keyboard,
         parse_mode='Markdown'
     )
 
@@ -324,16 +384,18 @@ async def admin_product_detail_callback(update: Update, context: ContextTypes.DE
         await query.answer("❌ Доступ запрещён", show_alert=True)
         return
     
-    await query.answer()
+    ack(update, context)
     
-    product_id = int(query.data.split('_')[-1])
-    product = data_manager.get_product(product_id)
+    product_id = int(_RE_TRAILING_ID.search(query.data)[1])
+    product = await data_manager.aio.get_product(product_id)
     
     if not product:
         await query.edit_message_text("❌ Товар не найден")
         return
     
     context.user_data['admin_product_id'] = product_id
+    # Stamped so any later catalog change (here, by another admin, or on disk) makes it stale
+    context.user_data['admin_product'] = (data_manager.catalog_version, product)
     
     available = "✅ Доступен" if product.get('available', True) else "❌ Скрыт"
     
@@ -352,6 +414,14 @@ async def admin_product_detail_callback(update: Update, context: ContextTypes.DE
     )
 
 
+async def get_admin_product(context: ContextTypes.DEFAULT_TYPE, product_id: int) -> Optional[Dict]:
+    """Product opened in the admin detail view while the catalog is unchanged, else from storage"""
+    stashed = context.user_data.get('admin_product')
+    if stashed and stashed[0] == data_manager.catalog_version and stashed[1]['id'] == product_id:
+        return stashed[1]
+    return await data_manager.aio.get_product(product_id)
+
+
 async def admin_edit_price_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle edit price button"""
     query = update.callback_query
@@ -360,12 +430,12 @@ async def admin_edit_price_callback(update: Update, context: ContextTypes.DEFAUL
         await query.answer("❌ Доступ запрещён", show_alert=True)
         return
     
-    await query.answer()
+    ack(update, context)
     
-    product_id = int(query.data.split('_')[-1])
+    product_id = int(_RE_TRAILING_ID.search(query.data)[1])
     context.user_data['admin_product_id'] = product_id
     
-    product = data_manager.get_product(product_id)
+    product = await get_admin_product(context, product_id)
     
     await query.edit_message_text(
         f"✏️ *Изменение цены*\n\n"
@@ -379,20 +449,18 @@ async def admin_edit_price_callback(update: Update, context: ContextTypes.DEFAUL
 
 async def receive_admin_price(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle new price input"""
-    try:
-        new_price = int(update.message.text.strip())
-        if new_price <= 0:
-            raise ValueError("Price must be positive")
-    except ValueError:
+    # isdecimal (not isdigit) so int() can't raise on characters like '²'
+    text = update.message.text.strip()
+    if not (text.isdecimal() and (new_price := int(text)) > 0):
         await update.message.reply_text("❌ Введите корректную цену (целое положительное число)")
         return ADMIN_WAITING_PRICE
     
     product_id = context.user_data.get('admin_product_id')
     if product_id:
-        data_manager.update_product(product_id, {'price': new_price})
+        await data_manager.aio.update_product(product_id, {'price': new_price})
         await update.message.reply_text(
             f"✅ Цена обновлена: {new_price}₽",
-            reply_markup=get_admin_menu_keyboard()
+            reply_markup=_ADMIN_MENU_KB
         )
     
     return ConversationHandler.END
@@ -406,12 +474,12 @@ async def admin_edit_desc_callback(update: Update, context: ContextTypes.DEFAULT
         await query.answer("❌ Доступ запрещён", show_alert=True)
         return
     
-    await query.answer()
+    ack(update, context)
     
-    product_id = int(query.data.split('_')[-1])
+    product_id = int(_RE_TRAILING_ID.search(query.data)[1])
     context.user_data['admin_product_id'] = product_id
     
-    product = data_manager.get_product(product_id)
+    product = await get_admin_product(context, product_id)
     
     await query.edit_message_text(
         f"📝 *Изменение описания*\n\n"
@@ -429,10 +497,10 @@ async def receive_admin_desc(update: Update, context: ContextTypes.DEFAULT_TYPE)
     
     product_id = context.user_data.get('admin_product_id')
     if product_id:
-        data_manager.update_product(product_id, {'description': new_desc})
+        await data_manager.aio.update_product(product_id, {'description': new_desc})
         await update.message.reply_text(
             "✅ Описание обновлено!",
-            reply_markup=get_admin_menu_keyboard()
+            reply_markup=_ADMIN_MENU_KB
         )
     
     return ConversationHandler.END
@@ -446,21 +514,21 @@ async def admin_toggle_product_callback(update: Update, context: ContextTypes.DE
         await query.answer("❌ Доступ запрещён", show_alert=True)
         return
     
-    data = query.data
-    product_id = int(data.split('_')[-1])
+    match = _RE_TOGGLE_PRODUCT.match(query.data)
+    product_id = int(match[2])
     
-    if 'hide' in data:
-        data_manager.update_product(product_id, {'available': False})
+    if match[1] == 'hide':
+        await data_manager.aio.update_product(product_id, {'available': False})
         await query.answer("🚫 Товар скрыт")
     else:
-        data_manager.update_product(product_id, {'available': True})
+        await data_manager.aio.update_product(product_id, {'available': True})
         await query.answer("✅ Товар показан")
     
     # Refresh product list
-    products = data_manager.get_all_products()
+    count, keyboard = await get_product_list_view()
     await query.edit_message_text(
-        f"🍣 *Управление меню*\n\nТоваров: {len(products)}\nВыберите товар:",
-        reply_markup=get_admin_product_list_keyboard(products),
+        f"🍣 *Управление меню*\n\nТоваров: {count}\nВыберите товар:",
+        reply_markup=keyboard,
         parse_mode='Markdown'
     )
 
@@ -470,7 +538,7 @@ async def admin_promocodes_handler(update: Update, context: ContextTypes.DEFAULT
     if not is_admin(update.effective_user.id):
         return
     
-    promocodes = data_manager.get_all_promocodes()
+    promocodes = await data_manager.aio.get_all_promocodes()
     
     if not promocodes:
         text = "🎟 *Промокоды*\n\nНет активных промокодов."
@@ -501,24 +569,22 @@ async def admin_users_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
     if not is_admin(update.effective_user.id):
         return
     
-    users = data_manager.get_all_users()
+    users = await get_all_users_cached()
+    total = len(users)
     
-    # Sort by total orders
-    users = sorted(users, key=lambda x: x.get('total_orders', 0), reverse=True)
+    # Top 20 by total orders
+    top = heapq.nlargest(20, users, key=lambda x: x.get('total_orders', 0))
     
-    text = f"👥 *Пользователи ({len(users)})*\n\n"
+    lines = [
+        f"• *{user.get('first_name', 'Пользователь')}* (@{user.get('username', 'нет')})\n"
+        f"  Заказов: {user.get('total_orders', 0)} | Бонусы: {user.get('bonus_points', 0)}\n"
+        for user in top
+    ]
     
-    for user in users[:20]:  # Show top 20
-        username = user.get('username', 'нет')
-        first_name = user.get('first_name', 'Пользователь')
-        orders = user.get('total_orders', 0)
-        bonus = user.get('bonus_points', 0)
-        
-        text += f"• *{first_name}* (@{username})\n"
-        text += f"  Заказов: {orders} | Бонусы: {bonus}\n"
+    text = f"👥 *Пользователи ({total})*\n\n" + "".join(lines)
     
-    if len(users) > 20:
-        text += f"\n_...и ещё {len(users) - 20} пользователей_"
+    if total > 20:
+        text += f"\n_...и ещё {total - 20} пользователей_"
     
     await update.message.reply_text(text, parse_mode='Markdown')
 
@@ -528,11 +594,22 @@ async def admin_broadcast_handler(update: Update, context: ContextTypes.DEFAULT_
     if not is_admin(update.effective_user.id):
         return
     
-    users = data_manager.get_all_users()
+    broadcast = await data_manager.aio.get_broadcast()
+    if broadcast:
+        await update.message.reply_text(
+            f"⏳ *Рассылка уже идёт*\n\n"
+            f"Отправлено: {broadcast['sent']}\n"
+            f"Ошибок: {broadcast['failed']}\n"
+            f"В очереди: {len(broadcast['pending'])}",
+            parse_mode='Markdown'
+        )
+        return ConversationHandler.END
+    
+    recipients = sum(1 for user in await get_all_users_cached() if not user.get('blocked'))
     
     await update.message.reply_text(
         f"📢 *Рассылка сообщений*\n\n"
-        f"Получателей: {len(users)}\n\n"
+        f"Получателей: {recipients}\n\n"
         f"Введите текст сообщения для рассылки\n"
         f"(или /cancel для отмены):",
         parse_mode='Markdown'
@@ -547,35 +624,97 @@ async def receive_broadcast_message(update: Update, context: ContextTypes.DEFAUL
     if message_text.lower() == '/cancel':
         await update.message.reply_text(
             "❌ Рассылка отменена",
-            reply_markup=get_admin_menu_keyboard()
+            reply_markup=_ADMIN_MENU_KB
         )
         return ConversationHandler.END
     
-    users = data_manager.get_all_users()
-    sent = 0
-    failed = 0
+    users = await get_all_users_cached()
     
-    await update.message.reply_text(f"📤 Начинаю рассылку {len(users)} пользователям...")
+    # Persist the queue first so a restart resumes instead of losing or repeating sends
+    broadcast = {
+        'admin_chat_id': update.effective_chat.id,
+        'text': message_text,
+        'pending': [user['telegram_id'] for user in users if not user.get('blocked')],
+        'sent': 0,
+        'failed': 0
+    }
+    await data_manager.aio.save_broadcast(broadcast)
     
-    for user in users:
-        try:
-            await context.bot.send_message(
-                chat_id=user['telegram_id'],
-                text=f"📢 *Рассылка*\n\n{message_text}",
-                parse_mode='Markdown'
-            )
-            sent += 1
-        except Exception:
-            failed += 1
+    await update.message.reply_text(f"📤 Начинаю рассылку {len(broadcast['pending'])} пользователям...")
     
-    await update.message.reply_text(
-        f"✅ *Рассылка завершена*\n\n"
-        f"Отправлено: {sent}\n"
-        f"Ошибок: {failed}",
-        reply_markup=get_admin_menu_keyboard(),
+    # Send in the background so the admin's update isn't blocked for the whole run
+    context.application.create_task(run_broadcast(context.bot, broadcast), update=update)
+    return ConversationHandler.END
+
+
+def render_broadcast(message_text: str) -> Dict:
+    """Build broadcast send_message arguments; plain text skips Markdown parsing entirely"""
+    if any(c in message_text for c in MARKDOWN_CHARS):
+        return {'text': f"📢 *{BROADCAST_TITLE}*\n\n{message_text}", 'parse_mode': 'Markdown'}
+    # Same bold header, given as an entity so the body is sent exactly as typed
+    return {'text': f"{_BROADCAST_PREFIX}{BROADCAST_TITLE}\n\n{message_text}",
+            'entities': _BROADCAST_TITLE_ENTITIES}
+
+
+async def _send_broadcast_message(bot, semaphore: asyncio.Semaphore, chat_id: int,
+                                  message: Dict, blocked: set) -> bool:
+    """Send one broadcast message, waiting out flood control once"""
+    async with semaphore:
+        for _ in range(2):
+            try:
+                await bot.send_message(chat_id=chat_id, **message)
+                return True
+            except RetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+            except Forbidden:
+                blocked.add(chat_id)  # User blocked the bot
+                return False
+            except Exception:
+                return False
+        return False
+
+
+async def run_broadcast(bot, broadcast: Dict):
+    """Send a persisted broadcast in batches, checkpointing progress after each batch"""
+    semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+    message = render_broadcast(broadcast['text'])
+    pending = broadcast['pending']
+    
+    while pending:
+        batch = pending[:BROADCAST_BATCH]
+        blocked = set()
+        results = await asyncio.gather(*(
+            _send_broadcast_message(bot, semaphore, chat_id, message, blocked)
+            for chat_id in batch
+        ))
+        if blocked:
+            await data_manager.aio.mark_blocked(blocked)
+        sent = sum(results)
+        broadcast['sent'] += sent
+        broadcast['failed'] += len(results) - sent
+        del pending[:len(batch)]
+        await data_manager.aio.save_broadcast(broadcast)
+    
+    await data_manager.aio.clear_broadcast()
+    
+    await bot.send_message(
+        chat_id=broadcast['admin_chat_id'],
+        text=f"✅ *Рассылка завершена*\n\n"
+             f"Отправлено: {broadcast['sent']}\n"
+             f"Ошибок: {broadcast['failed']}",
+        reply_markup=_ADMIN_MENU_KB,
         parse_mode='Markdown'
     )
-    return ConversationHandler.END
+
+
+async def resume_broadcast(application: Application):
+    """Continue a broadcast interrupted by a restart (used as post_init)"""
+    global _resumed_broadcast
+    broadcast = await data_manager.aio.get_broadcast()
+    if broadcast:
+        # The application isn't running yet during post_init, so schedule on the loop directly;
+        # if it is cancelled at shutdown the checkpoint lets the next start pick it up again
+        _resumed_broadcast = asyncio.create_task(run_broadcast(application.bot, broadcast))
 
 
 async def admin_exit_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -589,31 +728,36 @@ async def admin_exit_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
 async def admin_back_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle back button in admin"""
     query = update.callback_query
-    await query.answer()
+    ack(update, context)
     await query.delete_message()
 
 
+# Admin menu button label -> handler
+ADMIN_MENU_ROUTES = {
+    "📋 Активные заказы": admin_orders_handler,
+    "📊 Статистика": admin_statistics_handler,
+    "🍣 Управление меню": admin_products_handler,
+    "🎟 Промокоды": admin_promocodes_handler,
+    "👥 Пользователи": admin_users_handler,
+    "📢 Рассылка": admin_broadcast_handler,
+    "⬅️ Выход из админки": admin_exit_handler,
+}
+ADMIN_MENU_PATTERN = "^(" + "|".join(map(re.escape, ADMIN_MENU_ROUTES)) + ")$"
+
+# Handler filters, built once at import
+_ADMIN_MENU_FILTER = filters.Regex(ADMIN_MENU_PATTERN) & filters.ChatType.PRIVATE
+_BROADCAST_FILTER = filters.Regex("^📢 Рассылка$") & filters.ChatType.PRIVATE
+_TEXT_INPUT_FILTER = filters.TEXT & ~filters.COMMAND
+
+
 async def admin_text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle text messages in admin menu"""
     if not is_admin(update.effective_user.id):
         return
     
-    text = update.message.text
-    
-    if text == "📋 Активные заказы":
-        await admin_orders_handler(update, context)
-    elif text == "📊 Статистика":
-        await admin_statistics_handler(update, context)
-    elif text == "🍣 Управление меню":
-        await admin_products_handler(update, context)
-    elif text == "🎟 Промокоды":
-        await admin_promocodes_handler(update, context)
-    elif text == "👥 Пользователи":
-        await admin_users_handler(update, context)
-    elif text == "📢 Рассылка":
-        return await admin_broadcast_handler(update, context)
-    elif text == "⬅️ Выход из админки":
-        await admin_exit_handler(update, context)
+    handler = ADMIN_MENU_ROUTES.get(update.message.text)
+    if handler:
+        return await handler(update, context)
 
 
 def get_admin_handlers() -> list:
@@ -626,7 +770,7 @@ def get_admin_handlers() -> list:
         ],
         states={
             ADMIN_WAITING_PRICE: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, receive_admin_price)
+                MessageHandler(_TEXT_INPUT_FILTER, receive_admin_price)
             ]
         },
         fallbacks=[CommandHandler("cancel", lambda u, c: ConversationHandler.END)],
@@ -639,7 +783,7 @@ def get_admin_handlers() -> list:
         ],
         states={
             ADMIN_WAITING_DESC: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, receive_admin_desc)
+                MessageHandler(_TEXT_INPUT_FILTER, receive_admin_desc)
             ]
         },
         fallbacks=[CommandHandler("cancel", lambda u, c: ConversationHandler.END)],
@@ -648,7 +792,7 @@ def get_admin_handlers() -> list:
     
     broadcast_conv = ConversationHandler(
         entry_points=[
-            MessageHandler(filters.Regex("^📢 Рассылка$") & filters.ChatType.PRIVATE, admin_broadcast_handler)
+            MessageHandler(_BROADCAST_FILTER, admin_broadcast_handler)
         ],
         states={
             ADMIN_WAITING_BROADCAST: [
@@ -676,9 +820,5 @@ def get_admin_handlers() -> list:
         CallbackQueryHandler(admin_back_callback, pattern="^admin_back$"),
         
         # Text handlers for admin menu buttons (lower priority)
-        MessageHandler(
-            filters.Regex("^(📋 Активные заказы|📊 Статистика|🍣 Управление меню|🎟 Промокоды|👥 Пользователи|⬅️ Выход из админки)$") 
-            & filters.ChatType.PRIVATE,
-            admin_text_handler
-        )
+        MessageHandler(_ADMIN_MENU_FILTER, admin_text_handler)
     ]
@@ -2,237 +2,409 @@
 Order handlers for order processing
 Contains shared order-related utilities and notification handlers
 """
-from telegram import Update
-from telegram.ext import ContextTypes
-import os
-import sys
+from telegram.error import RetryAfter
+from telegram.ext import Application, ContextTypes
+import asyncio
+import logging
+from dataclasses import dataclass
+from html import escape
+from datetime import datetime, time
+from functools import cached_property, lru_cache
+from types import MappingProxyType
+from typing import Dict, List, Optional
 
-# Add parent directory to path for imports
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.config import get_admin_ids
+from utils.data_manager import DataManager, get_data_manager
+from utils.keyboards import STATUS_VIEWS, UNKNOWN_STATUS_VIEW
 
-from utils.data_manager import DataManager
-from utils.keyboards import get_status_emoji, get_status_text
+logger = logging.getLogger(__name__)
 
-# Initialize data manager
-data_manager = DataManager()
+
+PAYMENT_METHODS = MappingProxyType({
+    'cash': 'Наличные',
+    'card_on_delivery': 'Карта курьеру',
+    'online': 'Онлайн'
+})
+
+# Customer-facing messages for status_changed notifications
+STATUS_CHANGED_MESSAGES = MappingProxyType({
+    'accepted': 'Ресторан принял ваш заказ! 👨‍🍳',
+    'preparing': 'Ваш заказ готовится. Скоро будет готов! 🍣',
+    'on_the_way': 'Курьер выехал! Ждите доставку! 🚗',
+    'delivered': 'Заказ доставлен! Приятного аппетита! 🎉'
+})
+
+# Notification delivery limits (Telegram: ~30 messages/s overall, 1 message/s per chat)
+NOTIFY_BATCH_SIZE = 30
+NOTIFY_BATCH_WINDOW = 0.05  # seconds to wait for a batch to fill up
+NOTIFY_CHAT_INTERVAL = 1.0
+
+_notify_queue: Optional[asyncio.Queue] = None
+_notify_worker: Optional[asyncio.Task] = None
+_chat_next_send: Dict[int, float] = {}  # chat_id -> earliest loop time for the next message
+
+# New-order notices arriving within this window reach each admin as one message
+ADMIN_DIGEST_WINDOW = 0.5
+MESSAGE_LIMIT = 4096  # Telegram max message length
+
+_admin_notices: List[str] = []
+_admin_digest_task: Optional[asyncio.Task] = None
 
 
 # Order status flow
 ORDER_STATUSES = ['new', 'accepted', 'preparing', 'on_the_way', 'delivered']
+_NEXT_STATUS = dict(zip(ORDER_STATUSES, ORDER_STATUSES[1:]))
+
+
+def html_escape(text) -> str:
+    """Escape dynamic text for parse_mode='HTML'"""
+    return escape(str(text), quote=False)
 
 
 def get_next_status(current_status: str) -> str:
     """Get the next status in the order flow"""
-    if current_status in ORDER_STATUSES:
-        current_index = ORDER_STATUSES.index(current_status)
-        if current_index < len(ORDER_STATUSES) - 1:
-            return ORDER_STATUSES[current_index + 1]
-    return current_status
+    return _NEXT_STATUS.get(current_status, current_status)
 
 
 def format_order_for_admin(order: dict) -> str:
     """Format order details for admin view"""
-    status_emoji = get_status_emoji(order['status'])
-    status_text = get_status_text(order['status'])
+    status_emoji, status_text = STATUS_VIEWS.get(order['status'], UNKNOWN_STATUS_VIEW)
     
+    # List, not generator: str.join builds a list from a generator anyway, so this is faster
     items_text = "\n".join([
-        f"  • {item['product_name']} x{item['quantity']} = {item['price'] * item['quantity']}₽"
+        f"  • {html_escape(item['product_name'])} x{item['quantity']} = {item['price'] * item['quantity']}₽"
         for item in order['items']
     ])
     
-    payment_methods = {
-        'cash': 'Наличные',
-        'card_on_delivery': 'Карта курьеру',
-        'online': 'Онлайн'
-    }
-    
     text = (
-        f"📦 *Заказ #{order['id']}*\n"
+        f"📦 <b>Заказ #{order['id']}</b>\n"
         f"{status_emoji} {status_text}\n\n"
-        f"📋 *Товары:*\n{items_text}\n\n"
-        f"💰 Итого: *{order['total']}₽*\n"
-        f"📍 {order['delivery_address']}\n"
-        f"📱 {order['phone']}\n"
-        f"💳 {payment_methods.get(order['payment_method'], order['payment_method'])}\n"
+        f"📋 <b>Товары:</b>\n{items_text}\n\n"
+        f"💰 Итого: <b>{order['total']}₽</b>\n"
+        f"📍 {html_escape(order['delivery_address'])}\n"
+        f"📱 {html_escape(order['phone'])}\n"
+        f"💳 {html_escape(PAYMENT_METHODS.get(order['payment_method'], order['payment_method']))}\n"
         f"📅 {order['created_at']}"
     )
     
     return text
 
 
+def format_orders_for_admin_bulk(orders: list) -> str:
+    """Format several orders for admin view as one message, blocks separated by blank lines"""
+    return "\n\n".join([format_order_for_admin(order) for order in orders])
+
+
 def format_order_for_customer(order: dict) -> str:
     """Format order details for customer view"""
-    status_emoji = get_status_emoji(order['status'])
-    status_text = get_status_text(order['status'])
+    status_emoji, status_text = STATUS_VIEWS.get(order['status'], UNKNOWN_STATUS_VIEW)
     
     items_text = "\n".join([
-        f"  • {item['product_name']} x{item['quantity']}"
+        f"  • {html_escape(item['product_name'])} x{item['quantity']}"
         for item in order['items']
     ])
     
     text = (
-        f"📦 *Заказ #{order['id']}*\n\n"
-        f"Статус: {status_emoji} *{status_text}*\n\n"
+        f"📦 <b>Заказ #{order['id']}</b>\n\n"
+        f"Статус: {status_emoji} <b>{status_text}</b>\n\n"
         f"📋 Товары:\n{items_text}\n\n"
-        f"💰 Сумма: *{order['total']}₽*\n"
-        f"📍 Адрес: {order['delivery_address']}"
+        f"💰 Сумма: <b>{order['total']}₽</b>\n"
+        f"📍 Адрес: {html_escape(order['delivery_address'])}"
     )
     
     return text
 
 
+def cart_subtotal(cart: list) -> float:
+    """Sum of item prices in the cart"""
+    subtotal = 0
+    for item in cart:
+        subtotal += item['price'] * item['quantity']
+    return subtotal
+
+
 def calculate_order_totals(cart: list, delivery_cost: float = 0, 
-                          discount: float = 0) -> dict:
-    """Calculate order totals"""
-    subtotal = sum(item['price'] * item['quantity'] for item in cart)
+                          discount: float = 0, subtotal: Optional[float] = None) -> dict:
+    """Calculate order totals (pass subtotal if already computed for this cart)"""
+    if subtotal is None:
+        subtotal = cart_subtotal(cart)
     total = subtotal + delivery_cost - discount
     
     return {
         'subtotal': subtotal,
         'delivery_cost': delivery_cost,
         'discount': discount,
-        'total': max(0, total)  # Ensure total is not negative
+        'total': total if total > 0 else 0  # Ensure total is not negative
     }
 
 
+@lru_cache(maxsize=16)
+def _parse_hhmm(value: str) -> time:
+    """Parse 'HH:MM' from config (memoized, the values rarely change)"""
+    return datetime.strptime(value, '%H:%M').time()
+
+
+@dataclass(frozen=True)
+class DeliveryConfig:
+    """Delivery section of config.yaml with defaults applied and hours parsed"""
+    min_order: float
+    free_from: float
+    cost: float
+    start_str: str
+    end_str: str
+    start: Optional[time]  # None if working hours can't be parsed
+    end: Optional[time]
+    
+    @cached_property
+    def min_order_error(self) -> tuple:
+        """validate_order() result for a cart below the minimum"""
+        return False, f"Минимальная сумма заказа: {self.min_order}₽"
+    
+    @cached_property
+    def working_hours_error(self) -> tuple:
+        """validate_order() result outside working hours"""
+        return False, f"Мы работаем с {self.start_str} до {self.end_str}"
+    
+    @classmethod
+    def from_config(cls, config: dict) -> 'DeliveryConfig':
+        """Build from the full bot config"""
+        delivery_config = config.get('delivery', {})
+        working_hours = delivery_config.get('working_hours', {})
+        start_str = working_hours.get('start', '10:00')
+        end_str = working_hours.get('end', '23:00')
+        try:
+            start, end = _parse_hhmm(start_str), _parse_hhmm(end_str)
+        except ValueError:
+            start = end = None
+        return cls(
+            min_order=delivery_config.get('min_order_amount', 0),
+            free_from=delivery_config.get('free_delivery_from', 1500),
+            cost=delivery_config.get('delivery_cost', 200),
+            start_str=start_str,
+            end_str=end_str,
+            start=start,
+            end=end
+        )
+
+
+# validate_order() results that don't depend on config
+_VALID_ORDER = (True, None)
+_ERR_EMPTY_CART = (False, "Корзина пуста")
+
+# Last (config, DeliveryConfig) pair; config dicts are loaded once and reused
+_delivery_config_memo: tuple = (None, None)
+
+
+def get_delivery_config(config: dict) -> DeliveryConfig:
+    """Parsed delivery settings, rebuilt only when a different config object is passed"""
+    global _delivery_config_memo
+    source, delivery = _delivery_config_memo
+    if source is not config:
+        delivery = DeliveryConfig.from_config(config)
+        _delivery_config_memo = (config, delivery)
+    return delivery
+
+
 def get_delivery_cost(subtotal: float, config: dict) -> float:
     """Calculate delivery cost based on order subtotal and config"""
-    delivery_config = config.get('delivery', {})
-    free_from = delivery_config.get('free_delivery_from', 1500)
-    delivery_cost = delivery_config.get('delivery_cost', 200)
-    
-    if subtotal >= free_from:
+    delivery = get_delivery_config(config)
+    if subtotal >= delivery.free_from:
         return 0
-    return delivery_cost
+    return delivery.cost
 
 
 def is_order_within_working_hours(config: dict) -> bool:
     """Check if current time is within working hours"""
-    from datetime import datetime
-    
-    delivery_config = config.get('delivery', {})
-    working_hours = delivery_config.get('working_hours', {})
-    
-    start_str = working_hours.get('start', '10:00')
-    end_str = working_hours.get('end', '23:00')
-    
-    try:
-        start_time = datetime.strptime(start_str, '%H:%M').time()
-        end_time = datetime.strptime(end_str, '%H:%M').time()
-        current_time = datetime.now().time()
-        
-        if start_time <= end_time:
-            return start_time <= current_time <= end_time
-        else:
-            # Handles overnight working hours (e.g., 22:00 - 02:00)
-            return current_time >= start_time or current_time <= end_time
-    except ValueError:
+    delivery = get_delivery_config(config)
+    start_time, end_time = delivery.start, delivery.end
+    if start_time is None:
         return True  # If parsing fails, assume we're open
+    
+    current_time = datetime.now().time()
+    if start_time <= end_time:
+        return start_time <= current_time <= end_time
+    else:
+        # Handles overnight working hours (e.g., 22:00 - 02:00)
+        return current_time >= start_time or current_time <= end_time
 
 
-def validate_order(cart: list, config: dict) -> tuple:
+def validate_order(cart: list, config: dict, subtotal: Optional[float] = None) -> tuple:
     """
     Validate order before checkout
     Returns (is_valid, error_message)
+    Compute subtotal once with cart_subtotal() and pass it here and to calculate_order_totals()
     """
     if not cart:
-        return False, "Корзина пуста"
+        return _ERR_EMPTY_CART
     
-    subtotal = sum(item['price'] * item['quantity'] for item in cart)
+    if subtotal is None:
+        subtotal = cart_subtotal(cart)
     
-    min_order = config.get('delivery', {}).get('min_order_amount', 0)
-    if subtotal < min_order:
-        return False, f"Минимальная сумма заказа: {min_order}₽"
+    delivery = get_delivery_config(config)
+    if subtotal < delivery.min_order:
+        return delivery.min_order_error
     
     if not is_order_within_working_hours(config):
-        working_hours = config.get('delivery', {}).get('working_hours', {})
-        start = working_hours.get('start', '10:00')
-        end = working_hours.get('end', '23:00')
-        return False, f"Мы работаем с {start} до {end}"
+        return delivery.working_hours_error
     
-    return True, None
+    return _VALID_ORDER
 
 
 async def send_order_notification(context: ContextTypes.DEFAULT_TYPE,
                                   user_id: int, order_id: int, 
-                                  notification_type: str, **kwargs):
+                                  notification_type: str, *,
+                                  order: Optional[Dict] = None, **kwargs):
     """
     Send order notification to user
     notification_type: 'created', 'status_changed', 'cancelled'
+    Pass order when it's already loaded (e.g. notifying several users about one order)
     """
-    order = data_manager.get_order(order_id)
+    if order is None:
+        order = get_data_manager().get_order(order_id)
     if not order:
         return
     
     if notification_type == 'created':
         text = (
-            f"✅ *Заказ #{order_id} создан!*\n\n"
+            f"✅ <b>Заказ #{order_id} создан!</b>\n\n"
             f"Сумма: {order['total']}₽\n"
             f"Ожидайте подтверждения от ресторана."
         )
     
     elif notification_type == 'status_changed':
         new_status = kwargs.get('new_status', order['status'])
-        status_emoji = get_status_emoji(new_status)
-        status_text = get_status_text(new_status)
-        
-        messages = {
-            'accepted': 'Ресторан принял ваш заказ! 👨‍🍳',
-            'preparing': 'Ваш заказ готовится. Скоро будет готов! 🍣',
-            'on_the_way': 'Курьер выехал! Ждите доставку! 🚗',
-            'delivered': 'Заказ доставлен! Приятного аппетита! 🎉'
-        }
+        status_emoji, status_text = STATUS_VIEWS.get(new_status, UNKNOWN_STATUS_VIEW)
         
         text = (
-            f"{status_emoji} *Обновление заказа #{order_id}*\n\n"
-            f"Статус: *{status_text}*\n\n"
-            f"{messages.get(new_status, '')}"
+            f"{status_emoji} <b>Обновление заказа #{order_id}</b>\n\n"
+            f"Статус: <b>{status_text}</b>\n\n"
+            f"{STATUS_CHANGED_MESSAGES.get(new_status, '')}"
         )
     
     elif notification_type == 'cancelled':
         text = (
-            f"❌ *Заказ #{order_id} отменён*\n\n"
-            f"Причина: {kwargs.get('reason', 'Не указана')}"
+            f"❌ <b>Заказ #{order_id} отменён</b>\n\n"
+            f"Причина: {html_escape(kwargs.get('reason', 'Не указана'))}"
         )
     
     else:
         return
     
-    try:
-        await context.bot.send_message(
-            chat_id=user_id,
-            text=text,
-            parse_mode='Markdown'
-        )
-    except Exception:
-        pass  # User might have blocked the bot
-
-
-def get_order_statistics(orders: list) -> dict:
-    """Calculate statistics from orders list"""
-    if not orders:
-        return {
-            'total_orders': 0,
-            'total_revenue': 0,
-            'average_order': 0,
-            'by_status': {}
-        }
-    
-    total_revenue = sum(o['total'] for o in orders if o['status'] != 'cancelled')
-    completed = [o for o in orders if o['status'] == 'delivered']
-    
-    by_status = {}
-    for order in orders:
-        status = order['status']
-        if status not in by_status:
-            by_status[status] = {'count': 0, 'revenue': 0}
-        by_status[status]['count'] += 1
-        by_status[status]['revenue'] += order['total']
+    enqueue_notification(context.bot, user_id, text)
+
+
+# ==================== Notification queue ====================
+def enqueue_notification(bot, chat_id: int, text: str, parse_mode: str = 'HTML'):
+    """Queue a message for the background sender, starting it on first use"""
+    global _notify_queue, _notify_worker
+    if _notify_queue is None:
+        _notify_queue = asyncio.Queue()
+    if _notify_worker is None or _notify_worker.done():
+        if _notify_worker is not None and not _notify_worker.cancelled() and _notify_worker.exception():
+            logger.error("Notification worker stopped", exc_info=_notify_worker.exception())
+        # Restart the sender only: messages still queued are delivered by the new worker
+        _notify_worker = asyncio.create_task(_notification_worker(bot))
+    _notify_queue.put_nowait((chat_id, text, parse_mode))
+
+
+def queue_admin_notice(bot, text: str):
+    """Collect an HTML new-order notice for admins, sent as a digest after a short window"""
+    global _admin_digest_task
+    _admin_notices.append(text)
+    if _admin_digest_task is None or _admin_digest_task.done():
+        _admin_digest_task = asyncio.create_task(_send_admin_digest(bot))
+
+
+async def _send_admin_digest(bot):
+    """Send collected notices to every admin, packing as many as fit into each message"""
+    await asyncio.sleep(ADMIN_DIGEST_WINDOW)
+    notices = _admin_notices[:]
+    _admin_notices.clear()
     
-    return {
-        'total_orders': len(orders),
-        'total_revenue': total_revenue,
-        'average_order': total_revenue / len(orders) if orders else 0,
-        'completed_orders': len(completed),
-        'by_status': by_status
-    }
+    messages = []
+    for notice in notices:
+        if messages and len(messages[-1]) + 2 + len(notice) <= MESSAGE_LIMIT:
+            messages[-1] += "\n\n" + notice
+        else:
+            messages.append(notice)
+    
+    for admin_id in get_admin_ids():
+        for text in messages:
+            enqueue_notification(bot, admin_id, text)
+
+
+async def _deliver_notification(bot, chat_id: int, text: str, parse_mode: str):
+    """Send one notification, spacing messages to the same chat"""
+    loop = asyncio.get_running_loop()
+    now = loop.time()
+    # Reserve the chat's next slot before sleeping so concurrent sends to it queue up
+    slot = max(now, _chat_next_send.get(chat_id, 0))
+    _chat_next_send[chat_id] = slot + NOTIFY_CHAT_INTERVAL
+    if slot > now:
+        await asyncio.sleep(slot - now)
+    await bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+
+
+async def _notification_worker(bot):
+    """Drain the notification queue in concurrent batches within Telegram rate limits"""
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await _notify_queue.get()]
+        started = loop.time()
+        deadline = started + NOTIFY_BATCH_WINDOW
+        while len(batch) < NOTIFY_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(_notify_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        
+        results = await asyncio.gather(
+            *(_deliver_notification(bot, *item) for item in batch),
+            return_exceptions=True
+        )
+        
+        retry_after = 0
+        for item, result in zip(batch, results):
+            if isinstance(result, RetryAfter):
+                retry_after = max(retry_after, result.retry_after)
+                _notify_queue.put_nowait(item)
+            elif isinstance(result, Exception):
+                # Not retried: the user may have blocked the bot, or Telegram rejected the text
+                logger.warning("Notification to %s not delivered: %s", item[0], result)
+            _notify_queue.task_done()
+        
+        now = loop.time()
+        if len(_chat_next_send) > 1024:
+            for chat_id in [c for c, t in _chat_next_send.items() if t <= now]:
+                del _chat_next_send[chat_id]
+        
+        if retry_after:
+            await asyncio.sleep(retry_after)
+        elif len(batch) == NOTIFY_BATCH_SIZE:
+            # Full batch: keep to the global messages-per-second limit
+            await asyncio.sleep(max(0, started + 1 - now))
+
+
+async def stop_notifications(application: Application, timeout: float = 5.0):
+    """Flush queued notifications and stop the sender (used as post_shutdown)"""
+    global _notify_worker
+    if _admin_digest_task is not None and not _admin_digest_task.done():
+        await _admin_digest_task
+    if _notify_worker is None:
+        return
+    try:
+        await asyncio.wait_for(_notify_queue.join(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    _notify_worker.cancel()
+    _notify_worker = None
+
+
+def get_order_statistics(orders: Optional[list] = None) -> dict:
+    """Calculate statistics from orders list (all stored orders if not given)"""
+    if orders is None:
+        return get_data_manager().get_order_statistics()
+    return DataManager.summarize_orders(orders)
@@ -2,7 +2,7 @@
 User handlers for customer interactions
 Handles menu browsing, cart, checkout, and order history
 """
-from telegram import Update
+from telegram import InlineKeyboardMarkup, Update
 from telegram.ext import (
     ContextTypes,
     CommandHandler,
@@ -11,13 +11,13 @@ from telegram.ext import (
     ConversationHandler,
     filters
 )
-import os
-import sys
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, Optional
 
-# Add parent directory to path for imports
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-from utils.data_manager import DataManager
+from handlers.order_handlers import html_escape, queue_admin_notice
+from utils.config import load_config
+from utils.data_manager import get_data_manager
 from utils.keyboards import (
     get_main_menu_keyboard,
     get_categories_keyboard,
@@ -31,8 +31,8 @@ from utils.keyboards import (
     get_phone_request_keyboard,
     get_order_list_keyboard,
     get_order_detail_keyboard,
-    get_status_emoji,
-    get_status_text
+    STATUS_VIEWS,
+    UNKNOWN_STATUS_VIEW
 )
 
 # Conversation states
@@ -40,8 +40,71 @@ WAITING_ADDRESS = 1
 WAITING_PHONE = 2
 WAITING_PROMOCODE = 3
 
-# Initialize data manager
-data_manager = DataManager()
+# Callback data parsing, compiled once
+_RE_TRAILING_ID = re.compile(r'_(\d+)$')
+
+# Payment button -> (stored method, text shown to customer)
+PAYMENT_OPTIONS = {
+    'pay_cash': ('cash', 'Наличные'),
+    'pay_card_on_delivery': ('card_on_delivery', 'Карта курьеру'),
+    'pay_online': ('online', 'Онлайн оплата')
+}
+
+# ==================== Static texts ====================
+HELP_TEXT = (
+    "🍣 *Помощь по боту*\n\n"
+    "📋 *Основные команды:*\n"
+    "/start - Главное меню\n"
+    "/menu - Посмотреть меню\n"
+    "/cart - Корзина\n"
+    "/orders - Мои заказы\n"
+    "/bonus - Бонусный счёт\n"
+    "/help - Эта справка\n\n"
+    "🛒 *Как сделать заказ:*\n"
+    "1. Выберите категорию в меню\n"
+    "2. Выберите блюдо и количество\n"
+    "3. Добавьте в корзину\n"
+    "4. Оформите заказ\n\n"
+    "📞 *Поддержка:* Используйте кнопку 'Контакты'"
+)
+
+BONUS_TEMPLATE = (
+    "💰 *Бонусная программа*\n\n"
+    "🎁 Ваши бонусы: *{bonus_points} баллов*\n"
+    "📦 Всего заказов: {total_orders}\n\n"
+    "ℹ️ Начисление бонусов: 1% от суммы заказа\n"
+    "💡 Бонусами можно оплатить до 50% заказа"
+)
+
+ABOUT_TEMPLATE = (
+    "ℹ️ *{name}*\n\n"
+    "📝 {description}\n\n"
+    "📍 Адрес: {address}\n"
+    "🕐 Время работы: 10:00 - 23:00\n\n"
+    "🚗 Бесплатная доставка от 1500₽\n"
+    "💰 Минимальный заказ: 500₽"
+)
+
+CONTACTS_TEMPLATE = (
+    "📞 *Контакты*\n\n"
+    "☎️ Телефон: {phone}\n"
+    "📧 Email: {email}\n\n"
+    "📍 Адрес: {address}"
+)
+
+RESTAURANT_DEFAULTS = {
+    'name': 'Суши Экспресс',
+    'description': '',
+    'address': 'Не указан',
+    'phone': '+79001234567',
+    'email': 'info@sushi.ru',
+}
+
+# template -> (settings.yaml stamp, rendered text)
+_restaurant_texts: Dict[str, tuple] = {}
+
+# Shared data manager; handlers await its I/O through data_manager.aio
+data_manager = get_data_manager()
 
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -49,15 +112,19 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     
     # Create or get user in database
-    db_user = data_manager.get_user(user.id)
+    db_user = await data_manager.aio.get_user(user.id)
     if not db_user:
-        data_manager.create_user(user.id, user.username, user.first_name)
+        await data_manager.aio.create_user(user.id, user.username, user.first_name)
+    elif db_user.get('blocked'):
+        # User came back after blocking the bot, include them in broadcasts again
+        await data_manager.aio.update_user(user.id, {'blocked': False})
     
     # Initialize cart in context
     if 'cart' not in context.user_data:
-        context.user_data['cart'] = []
+        context.user_data['cart'] = {}
+        context.user_data['cart_total'] = 0
     
-    settings = data_manager.get_settings()
+    settings = await data_manager.aio.get_settings()
     restaurant_name = settings.get('restaurant', {}).get('name', 'Суши Экспресс')
     
     welcome_text = (
@@ -76,42 +143,25 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /help command"""
-    help_text = (
-        "🍣 *Помощь по боту*\n\n"
-        "📋 *Основные команды:*\n"
-        "/start - Главное меню\n"
-        "/menu - Посмотреть меню\n"
-        "/cart - Корзина\n"
-        "/orders - Мои заказы\n"
-        "/bonus - Бонусный счёт\n"
-        "/help - Эта справка\n\n"
-        "🛒 *Как сделать заказ:*\n"
-        "1. Выберите категорию в меню\n"
-        "2. Выберите блюдо и количество\n"
-        "3. Добавьте в корзину\n"
-        "4. Оформите заказ\n\n"
-        "📞 *Поддержка:* Используйте кнопку 'Контакты'"
-    )
-    await update.message.reply_text(help_text, parse_mode='Markdown')
+    await update.message.reply_text(HELP_TEXT, parse_mode='Markdown')
 
 
 async def menu_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle menu button press"""
-    categories = data_manager.get_categories()
+    keyboard = await get_categories_markup(context)
     
     text = "🍱 *Выберите категорию:*"
     
     if update.callback_query:
-        await update.callback_query.answer()
         await update.callback_query.edit_message_text(
             text,
-            reply_markup=get_categories_keyboard(categories),
+            reply_markup=keyboard,
             parse_mode='Markdown'
         )
     else:
         await update.message.reply_text(
             text,
-            reply_markup=get_categories_keyboard(categories),
+            reply_markup=keyboard,
             parse_mode='Markdown'
         )
 
@@ -121,29 +171,55 @@ async def category_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     
-    category_id = int(query.data.split('_')[1])
+    category_id = int(_RE_TRAILING_ID.search(query.data)[1])
     context.user_data['current_category'] = category_id
     
-    category = data_manager.get_category(category_id)
-    products = data_manager.get_products(category_id)
+    view = await get_products_view(context, category_id)
     
-    if not products:
+    if not view:
         await query.edit_message_text(
             "😔 В этой категории пока нет доступных товаров.",
-            reply_markup=get_categories_keyboard(data_manager.get_categories())
+            reply_markup=await get_categories_markup(context)
         )
         return
     
-    category_name = category['name'] if category else "Товары"
-    emoji = category.get('emoji', '') if category else ''
-    
-    text = f"{emoji} *{category_name}*\n\nВыберите блюдо:"
-    
-    await query.edit_message_text(
-        text,
-        reply_markup=get_products_keyboard(products, category_id),
-        parse_mode='Markdown'
-    )
+    text, keyboard = view
+    await query.edit_message_text(text, reply_markup=keyboard, parse_mode='Markdown')
+
+
+async def _catalog_view(context: ContextTypes.DEFAULT_TYPE, key, render):
+    """View built by render(), reused until the catalog changes (saved by the bot or edited on disk)"""
+    stamp = data_manager.catalog_version
+    views = context.bot_data.setdefault('_catalog_views', {})
+    cached = views.get(key)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    view = await render()
+    views[key] = (stamp, view)
+    return view
+
+
+async def get_categories_markup(context: ContextTypes.DEFAULT_TYPE) -> InlineKeyboardMarkup:
+    """Categories keyboard, built once per catalog change"""
+    async def render():
+        return get_categories_keyboard(await data_manager.aio.get_categories())
+    return await _catalog_view(context, 'categories', render)
+
+
+async def get_products_view(context: ContextTypes.DEFAULT_TYPE, category_id: int) -> Optional[tuple]:
+    """Products list (text, keyboard) for a category, built once per catalog change"""
+    async def render():
+        products = await data_manager.aio.get_products(category_id)
+        if not products:
+            return None
+        category = await data_manager.aio.get_category(category_id)
+        category_name = category['name'] if category else "Товары"
+        emoji = category.get('emoji', '') if category else ''
+        return (
+            f"{emoji} *{category_name}*\n\nВыберите блюдо:",
+            get_products_keyboard(products, category_id)
+        )
+    return await _catalog_view(context, ('products', category_id), render)
 
 
 async def product_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -151,8 +227,8 @@ async def product_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     
-    product_id = int(query.data.split('_')[1])
-    product = data_manager.get_product(product_id)
+    product_id = int(_RE_TRAILING_ID.search(query.data)[1])
+    product = await data_manager.aio.get_product(product_id)
     
     if not product:
         await query.edit_message_text("❌ Товар не найден")
@@ -182,24 +258,17 @@ def format_product_detail(product: dict) -> str:
     )
 
 
-async def quantity_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle quantity +/- buttons"""
+async def _change_quantity(update: Update, context: ContextTypes.DEFAULT_TYPE, delta: int):
+    """Redraw product card with the selected quantity changed by delta (kept within 1..99)"""
     query = update.callback_query
-    data = query.data
-    
-    product_id = int(data.split('_')[-1])
-    current_qty = context.user_data.get('current_quantity', 1)
-    
-    if 'minus' in data and current_qty > 1:
-        current_qty -= 1
-    elif 'plus' in data and current_qty < 99:
-        current_qty += 1
+    product_id = int(_RE_TRAILING_ID.search(query.data)[1])
+    current_qty = min(max(context.user_data.get('current_quantity', 1) + delta, 1), 99)
     
     context.user_data['current_quantity'] = current_qty
     
     await query.answer(f"Количество: {current_qty}")
     
-    product = data_manager.get_product(product_id)
+    product = await data_manager.aio.get_product(product_id)
     text = format_product_detail(product)
     
     await query.edit_message_text(
@@ -209,60 +278,62 @@ async def quantity_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+async def quantity_minus_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle quantity - button"""
+    await _change_quantity(update, context, -1)
+
+
+async def quantity_plus_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle quantity + button"""
+    await _change_quantity(update, context, 1)
+
+
 async def add_to_cart_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle add to cart button"""
     query = update.callback_query
     
-    product_id = int(query.data.split('_')[-1])
+    product_id = int(_RE_TRAILING_ID.search(query.data)[1])
     quantity = context.user_data.get('current_quantity', 1)
     
-    product = data_manager.get_product(product_id)
+    product = await data_manager.aio.get_product(product_id)
     if not product:
         await query.answer("❌ Товар не найден", show_alert=True)
         return
     
     # Initialize cart if needed
     if 'cart' not in context.user_data:
-        context.user_data['cart'] = []
+        context.user_data['cart'] = {}
+        context.user_data['cart_total'] = 0
     
     cart = context.user_data['cart']
     
-    # Check if product already in cart
-    existing_item = next((item for item in cart if item['product_id'] == product_id), None)
-    
-    if existing_item:
-        existing_item['quantity'] += quantity
-    else:
-        cart.append({
-            'product_id': product_id,
-            'product_name': product['name'],
-            'price': product['price'],
-            'quantity': quantity
-        })
+    # Cart is keyed by product ID; an item already in cart keeps its price
+    item = cart.setdefault(product_id, {
+        'product_id': product_id,
+        'product_name': product['name'],
+        'price': product['price'],
+        'quantity': 0
+    })
+    item['quantity'] += quantity
+    _apply_delta(context.user_data, item['price'] * quantity)
     
     await query.answer(f"✅ {product['name']} x{quantity} добавлено в корзину!")
     
     # Return to products list
     category_id = context.user_data.get('current_category')
-    if category_id:
-        products = data_manager.get_products(category_id)
-        category = data_manager.get_category(category_id)
-        text = f"{category.get('emoji', '')} *{category['name']}*\n\nВыберите блюдо:"
-        await query.edit_message_text(
-            text,
-            reply_markup=get_products_keyboard(products, category_id),
-            parse_mode='Markdown'
-        )
+    view = category_id and await get_products_view(context, category_id)
+    if view:
+        text, keyboard = view
+        await query.edit_message_text(text, reply_markup=keyboard, parse_mode='Markdown')
 
 
 async def cart_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle cart button/command"""
-    cart = context.user_data.get('cart', [])
+    cart = context.user_data.get('cart', {})
     
     if not cart:
         text = "🛒 *Ваша корзина пуста*\n\nДобавьте товары из меню!"
         if update.callback_query:
-            await update.callback_query.answer()
             await update.callback_query.edit_message_text(
                 text,
                 reply_markup=get_empty_cart_keyboard(),
@@ -276,98 +347,111 @@ async def cart_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
         return
     
-    text = format_cart(cart)
+    text = format_cart(cart.values(), get_cart_total(context.user_data))
     
     if update.callback_query:
-        await update.callback_query.answer()
         await update.callback_query.edit_message_text(
             text,
-            reply_markup=get_cart_keyboard(cart),
+            reply_markup=get_cart_keyboard(cart.values()),
             parse_mode='Markdown'
         )
     else:
         await update.message.reply_text(
             text,
-            reply_markup=get_cart_keyboard(cart),
+            reply_markup=get_cart_keyboard(cart.values()),
             parse_mode='Markdown'
         )
 
 
-def format_cart(cart: list) -> str:
+def get_cart_total(user_data: dict) -> float:
+    """Get cart total maintained on cart changes, computing it once if missing"""
+    total = user_data.get('cart_total')
+    if total is None:
+        total = sum(item['price'] * item['quantity'] for item in user_data.get('cart', {}).values())
+        user_data['cart_total'] = total
+    return total
+
+
+def _apply_delta(user_data: dict, delta: float):
+    """Update cart total after the cart has been changed by delta"""
+    if 'cart_total' in user_data:
+        user_data['cart_total'] += delta
+    else:
+        get_cart_total(user_data)
+
+
+def format_cart(cart: Iterable[dict], total: float) -> str:
     """Format cart contents for display"""
-    total = sum(item['price'] * item['quantity'] for item in cart)
-    
-    lines = ["🛒 *Ваша корзина:*\n"]
-    for item in cart:
-        subtotal = item['price'] * item['quantity']
-        lines.append(f"• {item['product_name']} x{item['quantity']} = {subtotal}₽")
+    items_text = "\n".join([
+        f"• {item['product_name']} x{item['quantity']} = {item['price'] * item['quantity']}₽"
+        for item in cart
+    ])
+    return f"🛒 *Ваша корзина:*\n\n{items_text}\n\n💰 *Итого: {total}₽*"
+
+
+async def _show_changed_cart(query, context: ContextTypes.DEFAULT_TYPE):
+    """Redraw cart message after an item was changed or removed"""
+    cart = context.user_data.get('cart', {})
+    if not cart:
+        await query.edit_message_text(
+            "🛒 *Ваша корзина пуста*",
+            reply_markup=get_empty_cart_keyboard(),
+            parse_mode='Markdown'
+        )
+    else:
+        await query.edit_message_text(
+            format_cart(cart.values(), get_cart_total(context.user_data)),
+            reply_markup=get_cart_keyboard(cart.values()),
+            parse_mode='Markdown'
+        )
+
+
+async def _change_cart_quantity(update: Update, context: ContextTypes.DEFAULT_TYPE, delta: int):
+    """Change quantity of a cart item by delta, dropping it at zero"""
+    query = update.callback_query
+    product_id = int(_RE_TRAILING_ID.search(query.data)[1])
+    cart = context.user_data.setdefault('cart', {})
     
-    lines.append(f"\n💰 *Итого: {total}₽*")
+    item = cart.get(product_id)
+    if item:
+        item['quantity'] += delta
+        if item['quantity'] <= 0:
+            del cart[product_id]
+        _apply_delta(context.user_data, item['price'] * delta)
     
-    return "\n".join(lines)
+    await query.answer()
+    await _show_changed_cart(query, context)
+
+
+async def cart_minus_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle cart item - button"""
+    await _change_cart_quantity(update, context, -1)
+
 
+async def cart_plus_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle cart item + button"""
+    await _change_cart_quantity(update, context, 1)
 
-async def cart_modify_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle cart item quantity modification"""
+
+async def remove_from_cart_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle cart item remove button"""
     query = update.callback_query
-    data = query.data
-    
-    cart = context.user_data.get('cart', [])
+    product_id = int(_RE_TRAILING_ID.search(query.data)[1])
+    cart = context.user_data.setdefault('cart', {})
     
-    if 'cart_minus' in data or 'cart_plus' in data:
-        product_id = int(data.split('_')[-1])
-        
-        for item in cart:
-            if item['product_id'] == product_id:
-                if 'minus' in data:
-                    item['quantity'] -= 1
-                    if item['quantity'] <= 0:
-                        cart.remove(item)
-                else:
-                    item['quantity'] += 1
-                break
-        
-        context.user_data['cart'] = cart
-        await query.answer()
-        
-        if not cart:
-            await query.edit_message_text(
-                "🛒 *Ваша корзина пуста*",
-                reply_markup=get_empty_cart_keyboard(),
-                parse_mode='Markdown'
-            )
-        else:
-            await query.edit_message_text(
-                format_cart(cart),
-                reply_markup=get_cart_keyboard(cart),
-                parse_mode='Markdown'
-            )
+    item = cart.pop(product_id, None)
+    if item:
+        _apply_delta(context.user_data, -item['price'] * item['quantity'])
     
-    elif 'remove_from_cart' in data:
-        product_id = int(data.split('_')[-1])
-        cart = [item for item in cart if item['product_id'] != product_id]
-        context.user_data['cart'] = cart
-        
-        await query.answer("✅ Товар удалён")
-        
-        if not cart:
-            await query.edit_message_text(
-                "🛒 *Ваша корзина пуста*",
-                reply_markup=get_empty_cart_keyboard(),
-                parse_mode='Markdown'
-            )
-        else:
-            await query.edit_message_text(
-                format_cart(cart),
-                reply_markup=get_cart_keyboard(cart),
-                parse_mode='Markdown'
-            )
+    await query.answer("✅ Товар удалён")
+    await _show_changed_cart(query, context)
 
 
 async def clear_cart_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle clear cart button"""
     query = update.callback_query
-    context.user_data['cart'] = []
+    context.user_data['cart'] = {}
+    context.user_data['cart_total'] = 0
     
     await query.answer("🗑 Корзина очищена")
     await query.edit_message_text(
@@ -380,29 +464,29 @@ async def clear_cart_callback(update: Update, context: ContextTypes.DEFAULT_TYPE
 async def checkout_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle checkout button"""
     query = update.callback_query
-    await query.answer()
     
-    cart = context.user_data.get('cart', [])
+    cart = context.user_data.get('cart', {})
     if not cart:
+        await query.answer()
         await query.edit_message_text(
             "🛒 Корзина пуста!",
             reply_markup=get_empty_cart_keyboard()
         )
         return
     
-    user = data_manager.get_user(update.effective_user.id)
-    total = sum(item['price'] * item['quantity'] for item in cart)
+    total = get_cart_total(context.user_data)
     
-    # Check minimum order
-    import yaml
-    with open('config.yaml', 'r', encoding='utf-8') as f:
-        config = yaml.safe_load(f)
+    # Check minimum order; a query can be answered only once, so the alert is the answer
+    config = load_config()
     
     min_order = config.get('delivery', {}).get('min_order_amount', 0)
     if total < min_order:
         await query.answer(f"Минимальная сумма заказа: {min_order}₽", show_alert=True)
         return
     
+    await query.answer()
+    user = await data_manager.aio.get_user(update.effective_user.id)
+    
     # Calculate delivery
     free_delivery_from = config.get('delivery', {}).get('free_delivery_from', 1500)
     delivery_cost = config.get('delivery', {}).get('delivery_cost', 200) if total < free_delivery_from else 0
@@ -420,41 +504,64 @@ async def checkout_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     phone = user.get('phone') if user else None
     context.user_data['phone'] = phone
     
-    text = format_checkout(cart, total, delivery_cost, address, phone)
+    text = format_checkout(cart.values(), total, delivery_cost, address, phone)
     
     await query.edit_message_text(
         text,
         reply_markup=get_checkout_keyboard(),
-        parse_mode='Markdown'
+        parse_mode='HTML'
     )
 
 
-def format_checkout(cart: list, subtotal: float, delivery_cost: float, 
+def format_checkout(cart: Iterable[dict], subtotal: float, delivery_cost: float, 
                    address: str = None, phone: str = None, 
                    discount: float = 0, promo_code: str = None) -> str:
-    """Format checkout summary"""
-    lines = ["📋 *Оформление заказа*\n"]
-    
-    for item in cart:
-        lines.append(f"• {item['product_name']} x{item['quantity']} = {item['price'] * item['quantity']}₽")
-    
-    lines.append(f"\n💵 Сумма: {subtotal}₽")
-    
-    if discount > 0:
-        lines.append(f"🎟 Скидка ({promo_code}): -{discount:.0f}₽")
-    
-    if delivery_cost > 0:
-        lines.append(f"🚗 Доставка: {delivery_cost}₽")
-    else:
-        lines.append("🚗 Доставка: *Бесплатно* ✨")
-    
+    """Format checkout summary (HTML: address and phone are typed by the customer)"""
+    items_text = "\n".join([
+        f"• {html_escape(item['product_name'])} x{item['quantity']} = {item['price'] * item['quantity']}₽"
+        for item in cart
+    ])
+    discount_line = f"🎟 Скидка ({html_escape(promo_code)}): -{discount:.0f}₽\n" if discount > 0 else ""
+    delivery_text = f"{delivery_cost}₽" if delivery_cost > 0 else "<b>Бесплатно</b> ✨"
     total = subtotal - discount + delivery_cost
-    lines.append(f"\n💰 *Итого к оплате: {total:.0f}₽*")
     
-    lines.append(f"\n📍 Адрес: {address or '❗️ Не указан'}")
-    lines.append(f"📱 Телефон: {phone or '❗️ Не указан'}")
+    return (
+        f"📋 <b>Оформление заказа</b>\n\n"
+        f"{items_text}\n\n"
+        f"💵 Сумма: {subtotal}₽\n"
+        f"{discount_line}"
+        f"🚗 Доставка: {delivery_text}\n\n"
+        f"💰 <b>Итого к оплате: {total:.0f}₽</b>\n\n"
+        f"📍 Адрес: {html_escape(address) if address else '❗️ Не указан'}\n"
+        f"📱 Телефон: {html_escape(phone) if phone else '❗️ Не указан'}"
+    )
+
+
+async def send_checkout_summary(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show checkout summary from the order details collected in user_data"""
+    user_data = context.user_data
+    text = format_checkout(
+        user_data.get('cart', {}).values(),
+        user_data.get('order_subtotal', 0),
+        user_data.get('delivery_cost', 0),
+        user_data.get('delivery_address'),
+        user_data.get('phone'),
+        user_data.get('discount', 0),
+        user_data.get('promo_code')
+    )
     
-    return "\n".join(lines)
+    if update.callback_query:
+        await update.callback_query.edit_message_text(
+            text,
+            reply_markup=get_checkout_keyboard(),
+            parse_mode='HTML'
+        )
+    else:
+        await update.message.reply_text(
+            text,
+            reply_markup=get_checkout_keyboard(),
+            parse_mode='HTML'
+        )
 
 
 async def change_address_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -462,8 +569,10 @@ async def change_address_callback(update: Update, context: ContextTypes.DEFAULT_
     query = update.callback_query
     await query.answer()
     
-    user = data_manager.get_user(update.effective_user.id)
+    user = await data_manager.aio.get_user(update.effective_user.id)
     addresses = user.get('addresses', []) if user else []
+    # Keyboard buttons refer to addresses by index into this list
+    context.user_data['_saved_addresses'] = addresses
     
     if addresses:
         await query.edit_message_text(
@@ -484,29 +593,22 @@ async def use_address_callback(update: Update, context: ContextTypes.DEFAULT_TYP
     """Handle saved address selection"""
     query = update.callback_query
     
-    address_index = int(query.data.split('_')[-1])
-    user = data_manager.get_user(update.effective_user.id)
-    addresses = user.get('addresses', []) if user else []
+    address_index = int(_RE_TRAILING_ID.search(query.data)[1])
+    addresses = context.user_data.get('_saved_addresses')
+    if addresses is None:
+        user = await data_manager.aio.get_user(update.effective_user.id)
+        addresses = user.get('addresses', []) if user else []
     
-    if 0 <= address_index < len(addresses):
-        context.user_data['delivery_address'] = addresses[address_index]
-        await query.answer(f"✅ Адрес выбран")
-        
-        # Return to checkout
-        cart = context.user_data.get('cart', [])
-        subtotal = context.user_data.get('order_subtotal', 0)
-        delivery_cost = context.user_data.get('delivery_cost', 0)
-        phone = context.user_data.get('phone')
-        discount = context.user_data.get('discount', 0)
-        promo_code = context.user_data.get('promo_code')
-        
-        text = format_checkout(cart, subtotal, delivery_cost, 
-                              addresses[address_index], phone, discount, promo_code)
-        await query.edit_message_text(
-            text,
-            reply_markup=get_checkout_keyboard(),
-            parse_mode='Markdown'
-        )
+    if not 0 <= address_index < len(addresses):
+        # The address list changed since the keyboard was sent
+        await query.answer("❌ Адрес не найден", show_alert=True)
+        return
+    
+    context.user_data['delivery_address'] = addresses[address_index]
+    await query.answer(f"✅ Адрес выбран")
+    
+    # Return to checkout
+    await send_checkout_summary(update, context)
 
 
 async def new_address_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -529,7 +631,7 @@ async def receive_address(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data['delivery_address'] = address
     
     # Save address to user profile
-    data_manager.add_user_address(update.effective_user.id, address)
+    await data_manager.aio.add_user_address(update.effective_user.id, address)
     
     await update.message.reply_text("✅ Адрес сохранён!")
     
@@ -542,19 +644,7 @@ async def receive_address(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return WAITING_PHONE
     
     # Return to checkout
-    cart = context.user_data.get('cart', [])
-    subtotal = context.user_data.get('order_subtotal', 0)
-    delivery_cost = context.user_data.get('delivery_cost', 0)
-    phone = context.user_data.get('phone')
-    discount = context.user_data.get('discount', 0)
-    promo_code = context.user_data.get('promo_code')
-    
-    text = format_checkout(cart, subtotal, delivery_cost, address, phone, discount, promo_code)
-    await update.message.reply_text(
-        text,
-        reply_markup=get_checkout_keyboard(),
-        parse_mode='Markdown'
-    )
+    await send_checkout_summary(update, context)
     return ConversationHandler.END
 
 
@@ -568,7 +658,7 @@ async def receive_phone(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data['phone'] = phone
     
     # Save phone to user profile
-    data_manager.update_user(update.effective_user.id, {'phone': phone})
+    await data_manager.aio.update_user(update.effective_user.id, {'phone': phone})
     
     await update.message.reply_text(
         "✅ Номер телефона сохранён!",
@@ -576,19 +666,7 @@ async def receive_phone(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     
     # Return to checkout
-    cart = context.user_data.get('cart', [])
-    subtotal = context.user_data.get('order_subtotal', 0)
-    delivery_cost = context.user_data.get('delivery_cost', 0)
-    address = context.user_data.get('delivery_address')
-    discount = context.user_data.get('discount', 0)
-    promo_code = context.user_data.get('promo_code')
-    
-    text = format_checkout(cart, subtotal, delivery_cost, address, phone, discount, promo_code)
-    await update.message.reply_text(
-        text,
-        reply_markup=get_checkout_keyboard(),
-        parse_mode='Markdown'
-    )
+    await send_checkout_summary(update, context)
     return ConversationHandler.END
 
 
@@ -609,7 +687,7 @@ async def receive_promocode(update: Update, context: ContextTypes.DEFAULT_TYPE):
     code = update.message.text.strip().upper()
     subtotal = context.user_data.get('order_subtotal', 0)
     
-    promo = data_manager.check_promocode(code, subtotal)
+    promo = await data_manager.aio.check_promocode(code, subtotal)
     
     if promo:
         discount = data_manager.calculate_discount(promo, subtotal)
@@ -624,19 +702,7 @@ async def receive_promocode(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
     
     # Return to checkout
-    cart = context.user_data.get('cart', [])
-    delivery_cost = context.user_data.get('delivery_cost', 0)
-    address = context.user_data.get('delivery_address')
-    phone = context.user_data.get('phone')
-    discount = context.user_data.get('discount', 0)
-    promo_code = context.user_data.get('promo_code')
-    
-    text = format_checkout(cart, subtotal, delivery_cost, address, phone, discount, promo_code)
-    await update.message.reply_text(
-        text,
-        reply_markup=get_checkout_keyboard(),
-        parse_mode='Markdown'
-    )
+    await send_checkout_summary(update, context)
     return ConversationHandler.END
 
 
@@ -664,107 +730,102 @@ async def confirm_order_callback(update: Update, context: ContextTypes.DEFAULT_T
 async def payment_method_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle payment method selection and create order"""
     query = update.callback_query
-    data = query.data
-    
-    # Determine payment method
-    if 'cash' in data:
-        payment_method = 'cash'
-        payment_text = 'Наличные'
-    elif 'card_on_delivery' in data:
-        payment_method = 'card_on_delivery'
-        payment_text = 'Карта курьеру'
-    else:
-        payment_method = 'online'
-        payment_text = 'Онлайн оплата'
-    
-    cart = context.user_data.get('cart', [])
-    
-    # Create order
-    order_data = {
-        'user_id': update.effective_user.id,
-        'items': cart,
-        'subtotal': context.user_data.get('order_subtotal', 0),
-        'delivery_cost': context.user_data.get('delivery_cost', 0),
-        'discount': context.user_data.get('discount', 0),
-        'promo_code': context.user_data.get('promo_code'),
-        'total': context.user_data.get('order_total', 0),
-        'delivery_address': context.user_data.get('delivery_address'),
-        'phone': context.user_data.get('phone'),
-        'payment_method': payment_method,
-        'comment': ''
-    }
-    
-    order_id = data_manager.create_order(order_data)
-    
-    # Use promocode if applied
-    if context.user_data.get('promo_code'):
-        data_manager.use_promocode(context.user_data['promo_code'])
-    
-    # Clear cart
-    context.user_data['cart'] = []
-    context.user_data['discount'] = 0
-    context.user_data['promo_code'] = None
+    cart = context.user_data.get('cart', {})
     
-    await query.answer("✅ Заказ создан!")
+    # A repeated tap must not create a second order; the flag is taken before the first await
+    if context.user_data.get('_order_inflight'):
+        await query.answer("⏳ Заказ уже оформляется")
+        return
+    if not cart:
+        await query.answer("🛒 Корзина пуста!")
+        return
+    context.user_data['_order_inflight'] = True
+    try:
+        # Ack before persisting the order; the edited message below is the confirmation
+        await query.answer("⏳ Оформляем заказ...")
+        
+        # Determine payment method
+        payment_method, payment_text = PAYMENT_OPTIONS.get(query.data, PAYMENT_OPTIONS['pay_online'])
+        
+        # Create order
+        order_data = {
+            'user_id': update.effective_user.id,
+            'items': list(cart.values()),
+            'subtotal': context.user_data.get('order_subtotal', 0),
+            'delivery_cost': context.user_data.get('delivery_cost', 0),
+            'discount': context.user_data.get('discount', 0),
+            'promo_code': context.user_data.get('promo_code'),
+            'total': context.user_data.get('order_total', 0),
+            'delivery_address': context.user_data.get('delivery_address'),
+            'phone': context.user_data.get('phone'),
+            'payment_method': payment_method,
+            'comment': ''
+        }
+        
+        order_id = await data_manager.aio.create_order(order_data)
+        
+        # Use promocode if applied
+        if context.user_data.get('promo_code'):
+            await data_manager.aio.use_promocode(context.user_data['promo_code'])
+        
+        # Clear cart
+        context.user_data['cart'] = {}
+        context.user_data['cart_total'] = 0
+        context.user_data['discount'] = 0
+        context.user_data['promo_code'] = None
+        context.user_data.pop('_saved_addresses', None)
+    finally:
+        context.user_data['_order_inflight'] = False
     
     text = (
-        f"🎉 *Заказ #{order_id} оформлен!*\n\n"
-        f"📍 Адрес: {order_data['delivery_address']}\n"
-        f"📱 Телефон: {order_data['phone']}\n"
+        f"🎉 <b>Заказ #{order_id} оформлен!</b>\n\n"
+        f"📍 Адрес: {html_escape(order_data['delivery_address'])}\n"
+        f"📱 Телефон: {html_escape(order_data['phone'])}\n"
         f"💳 Оплата: {payment_text}\n"
         f"💰 Сумма: {order_data['total']:.0f}₽\n\n"
         f"Статус заказа: 🆕 Новый\n\n"
         f"Мы уведомим вас об изменении статуса заказа."
     )
     
-    await query.edit_message_text(text, parse_mode='Markdown')
+    await query.edit_message_text(text, parse_mode='HTML')
     
-    # Notify admins
-    await notify_admins_new_order(context, order_id, order_data)
+    # Queued for the background sender so the customer isn't waiting on N sends
+    notify_admins_new_order(context, order_id, order_data)
 
 
-async def notify_admins_new_order(context: ContextTypes.DEFAULT_TYPE, 
-                                   order_id: int, order_data: dict):
-    """Send notification to admins about new order"""
-    import yaml
-    with open('config.yaml', 'r', encoding='utf-8') as f:
-        config = yaml.safe_load(f)
-    
-    admin_ids = config.get('bot', {}).get('admin_ids', [])
-    
-    items_text = "\n".join([
-        f"  • {item['product_name']} x{item['quantity']} = {item['price'] * item['quantity']}₽"
-        for item in order_data['items']
+def format_order_items(items: list) -> str:
+    """HTML order items block shared by the admin notification and order details"""
+    return "\n".join([
+        f"  • {html_escape(item['product_name'])} x{item['quantity']} = {item['price'] * item['quantity']}₽"
+        for item in items
     ])
+
+
+def notify_admins_new_order(context: ContextTypes.DEFAULT_TYPE, 
+                            order_id: int, order_data: dict):
+    """Send notification to admins about new order"""
+    items_text = format_order_items(order_data['items'])
     
     text = (
-        f"🆕 *Новый заказ #{order_id}!*\n\n"
+        f"🆕 <b>Новый заказ #{order_id}!</b>\n\n"
         f"📦 Товары:\n{items_text}\n\n"
         f"💰 Сумма: {order_data['total']:.0f}₽\n"
-        f"📍 Адрес: {order_data['delivery_address']}\n"
-        f"📱 Телефон: {order_data['phone']}\n"
+        f"📍 Адрес: {html_escape(order_data['delivery_address'])}\n"
+        f"📱 Телефон: {html_escape(order_data['phone'])}\n"
         f"💳 Оплата: {order_data['payment_method']}"
     )
     
-    for admin_id in admin_ids:
-        try:
-            await context.bot.send_message(
-                chat_id=admin_id,
-                text=text,
-                parse_mode='Markdown'
-            )
-        except Exception:
-            pass  # Admin might have blocked the bot
+    # Orders placed within a short window reach each admin as one digest
+    queue_admin_notice(context.bot, text)
 
 
 async def orders_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle orders button/command"""
-    orders = data_manager.get_user_orders(update.effective_user.id)
+    orders = await data_manager.aio.get_user_orders(update.effective_user.id)
     
     if not orders:
         text = "📦 *Мои заказы*\n\nУ вас пока нет заказов."
         if update.callback_query:
-            await update.callback_query.answer()
             await update.callback_query.edit_message_text(
                 text,
                 reply_markup=get_empty_cart_keyboard(),
@@ -781,7 +842,6 @@ async def orders_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = "📦 *Мои заказы:*\n\nВыберите заказ для подробностей:"
     
     if update.callback_query:
-        await update.callback_query.answer()
         await update.callback_query.edit_message_text(
             text,
             reply_markup=get_order_list_keyboard(orders),
@@ -800,27 +860,23 @@ async def view_order_callback(update: Update, context: ContextTypes.DEFAULT_TYPE
     query = update.callback_query
     await query.answer()
     
-    order_id = int(query.data.split('_')[-1])
-    order = data_manager.get_order(order_id)
+    order_id = int(_RE_TRAILING_ID.search(query.data)[1])
+    order = await data_manager.aio.get_order(order_id)
     
     if not order:
         await query.edit_message_text("❌ Заказ не найден")
         return
     
-    status_emoji = get_status_emoji(order['status'])
-    status_text = get_status_text(order['status'])
+    status_emoji, status_text = STATUS_VIEWS.get(order['status'], UNKNOWN_STATUS_VIEW)
     
-    items_text = "\n".join([
-        f"  • {item['product_name']} x{item['quantity']} = {item['price'] * item['quantity']}₽"
-        for item in order['items']
-    ])
+    items_text = format_order_items(order['items'])
     
     text = (
-        f"📦 *Заказ #{order['id']}*\n\n"
-        f"{status_emoji} Статус: *{status_text}*\n\n"
+        f"📦 <b>Заказ #{order['id']}</b>\n\n"
+        f"{status_emoji} Статус: <b>{status_text}</b>\n\n"
         f"📋 Товары:\n{items_text}\n\n"
         f"💰 Сумма: {order['total']}₽\n"
-        f"📍 Адрес: {order['delivery_address']}\n"
+        f"📍 Адрес: {html_escape(order['delivery_address'])}\n"
         f"📅 Дата: {order['created_at']}"
     )
     
@@ -830,7 +886,7 @@ async def view_order_callback(update: Update, context: ContextTypes.DEFAULT_TYPE
     await query.edit_message_text(
         text,
         reply_markup=get_order_detail_keyboard(order_id, order['status']),
-        parse_mode='Markdown'
+        parse_mode='HTML'
     )
 
 
@@ -838,24 +894,26 @@ async def reorder_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle reorder button"""
     query = update.callback_query
     
-    order_id = int(query.data.split('_')[-1])
-    order = data_manager.get_order(order_id)
+    order_id = int(_RE_TRAILING_ID.search(query.data)[1])
+    order = await data_manager.aio.get_order(order_id)
     
     if not order:
         await query.answer("❌ Заказ не найден", show_alert=True)
         return
     
     # Copy items to cart
-    context.user_data['cart'] = []
+    cart = context.user_data['cart'] = {}
+    context.user_data.pop('cart_total', None)
+    products = await data_manager.aio.get_products_by_ids([item['product_id'] for item in order['items']])
     for item in order['items']:
-        product = data_manager.get_product(item['product_id'])
+        product = products.get(item['product_id'])
         if product and product.get('available', True):
-            context.user_data['cart'].append({
+            cart.setdefault(item['product_id'], {
                 'product_id': item['product_id'],
                 'product_name': item['product_name'],
                 'price': product['price'],  # Use current price
-                'quantity': item['quantity']
-            })
+                'quantity': 0
+            })['quantity'] += item['quantity']
     
     if not context.user_data['cart']:
         await query.answer("❌ Товары из этого заказа недоступны", show_alert=True)
@@ -869,8 +927,8 @@ async def cancel_order_callback(update: Update, context: ContextTypes.DEFAULT_TY
     """Handle order cancellation"""
     query = update.callback_query
     
-    order_id = int(query.data.split('_')[-1])
-    order = data_manager.get_order(order_id)
+    order_id = int(_RE_TRAILING_ID.search(query.data)[1])
+    order = await data_manager.aio.get_order(order_id)
     
     if not order:
         await query.answer("❌ Заказ не найден", show_alert=True)
@@ -880,7 +938,7 @@ async def cancel_order_callback(update: Update, context: ContextTypes.DEFAULT_TY
         await query.answer("❌ Этот заказ нельзя отменить", show_alert=True)
         return
     
-    data_manager.update_order_status(order_id, 'cancelled')
+    await data_manager.aio.update_order_status(order_id, 'cancelled')
     await query.answer("✅ Заказ отменён")
     
     await query.edit_message_text(
@@ -891,134 +949,114 @@ async def cancel_order_callback(update: Update, context: ContextTypes.DEFAULT_TY
 
 async def bonus_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle bonus/loyalty button"""
-    user = data_manager.get_user(update.effective_user.id)
+    user = await data_manager.aio.get_user(update.effective_user.id)
     bonus_points = user.get('bonus_points', 0) if user else 0
     total_orders = user.get('total_orders', 0) if user else 0
     
-    text = (
-        f"💰 *Бонусная программа*\n\n"
-        f"🎁 Ваши бонусы: *{bonus_points} баллов*\n"
-        f"📦 Всего заказов: {total_orders}\n\n"
-        f"ℹ️ Начисление бонусов: 1% от суммы заказа\n"
-        f"💡 Бонусами можно оплатить до 50% заказа"
-    )
+    text = BONUS_TEMPLATE.format(bonus_points=bonus_points, total_orders=total_orders)
     
     await update.message.reply_text(text, parse_mode='Markdown')
 
 
+def render_restaurant_text(template: str, restaurant: Dict) -> str:
+    """Fill a restaurant info template from the restaurant settings"""
+    return template.format(**{**RESTAURANT_DEFAULTS, **restaurant})
+
+
+async def get_restaurant_text(template: str) -> str:
+    """Get restaurant info text, rebuilt only when settings.yaml changes"""
+    stamp = data_manager.settings_version
+    cached = _restaurant_texts.get(template)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    settings = await data_manager.aio.get_settings()
+    text = render_restaurant_text(template, settings.get('restaurant', {}))
+    _restaurant_texts[template] = (stamp, text)
+    return text
+
+
 async def about_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle about us button"""
-    settings = data_manager.get_settings()
-    restaurant = settings.get('restaurant', {})
-    
-    text = (
-        f"ℹ️ *{restaurant.get('name', 'Суши Экспресс')}*\n\n"
-        f"📝 {restaurant.get('description', '')}\n\n"
-        f"📍 Адрес: {restaurant.get('address', 'Не указан')}\n"
-        f"🕐 Время работы: 10:00 - 23:00\n\n"
-        f"🚗 Бесплатная доставка от 1500₽\n"
-        f"💰 Минимальный заказ: 500₽"
-    )
-    
+    text = await get_restaurant_text(ABOUT_TEMPLATE)
     await update.message.reply_text(text, parse_mode='Markdown')
 
 
 async def contacts_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle contacts button"""
-    settings = data_manager.get_settings()
-    restaurant = settings.get('restaurant', {})
-    
-    text = (
-        f"📞 *Контакты*\n\n"
-        f"☎️ Телефон: {restaurant.get('phone', '+79001234567')}\n"
-        f"📧 Email: {restaurant.get('email', 'info@sushi.ru')}\n\n"
-        f"📍 Адрес: {restaurant.get('address', 'Не указан')}"
-    )
-    
+    text = await get_restaurant_text(CONTACTS_TEMPLATE)
     await update.message.reply_text(text, parse_mode='Markdown')
 
 
+async def _back_to_categories(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Return to the category list"""
+    await update.callback_query.edit_message_text(
+        "🍱 *Выберите категорию:*",
+        reply_markup=await get_categories_markup(context),
+        parse_mode='Markdown'
+    )
+
+
+async def _back_to_products(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Return to the product list of the current category"""
+    category_id = context.user_data.get('current_category')
+    view = category_id and await get_products_view(context, category_id)
+    if view:
+        text, keyboard = view
+        await update.callback_query.edit_message_text(text, reply_markup=keyboard, parse_mode='Markdown')
+
+
+async def _cancel_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Cancel the current action and show the main menu"""
+    await update.message.reply_text(
+        "Действие отменено.",
+        reply_markup=get_main_menu_keyboard()
+    )
+
+
+# Back buttons: callback data -> handler
+BACK_DISPATCH = {
+    "back_to_main": menu_handler,
+    "go_to_menu": menu_handler,
+    "back_to_categories": _back_to_categories,
+    "back_to_products": _back_to_products,
+    "back_to_cart": cart_handler,
+    "back_to_checkout": send_checkout_summary,
+    "back_to_orders": orders_handler,
+    "continue_shopping": menu_handler,
+}
+
+# Main menu buttons: button text -> handler
+TEXT_DISPATCH = {
+    "🍱 Меню": menu_handler,
+    "🛒 Корзина": cart_handler,
+    "📦 Мои заказы": orders_handler,
+    "💰 Бонусы": bonus_handler,
+    "ℹ️ О нас": about_handler,
+    "📞 Контакты": contacts_handler,
+    "⬅️ Отмена": _cancel_action,
+}
+
+
 async def back_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle various back buttons"""
     query = update.callback_query
     await query.answer()
     
-    data = query.data
-    
-    if data == "back_to_main" or data == "go_to_menu":
-        await menu_handler(update, context)
-    
-    elif data == "back_to_categories":
-        categories = data_manager.get_categories()
-        await query.edit_message_text(
-            "🍱 *Выберите категорию:*",
-            reply_markup=get_categories_keyboard(categories),
-            parse_mode='Markdown'
-        )
-    
-    elif data == "back_to_products":
-        category_id = context.user_data.get('current_category')
-        if category_id:
-            products = data_manager.get_products(category_id)
-            category = data_manager.get_category(category_id)
-            text = f"{category.get('emoji', '')} *{category['name']}*\n\nВыберите блюдо:"
-            await query.edit_message_text(
-                text,
-                reply_markup=get_products_keyboard(products, category_id),
-                parse_mode='Markdown'
-            )
-    
-    elif data == "back_to_cart":
-        await cart_handler(update, context)
-    
-    elif data == "back_to_checkout":
-        cart = context.user_data.get('cart', [])
-        subtotal = context.user_data.get('order_subtotal', 0)
-        delivery_cost = context.user_data.get('delivery_cost', 0)
-        address = context.user_data.get('delivery_address')
-        phone = context.user_data.get('phone')
-        discount = context.user_data.get('discount', 0)
-        promo_code = context.user_data.get('promo_code')
-        
-        text = format_checkout(cart, subtotal, delivery_cost, address, phone, discount, promo_code)
-        await query.edit_message_text(
-            text,
-            reply_markup=get_checkout_keyboard(),
-            parse_mode='Markdown'
-        )
-    
-    elif data == "back_to_orders":
-        await orders_handler(update, context)
-    
-    elif data == "continue_shopping":
-        await menu_handler(update, context)
+    handler = BACK_DISPATCH.get(query.data)
+    if handler:
+        await handler(update, context)
 
 
 async def text_message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle text messages from main menu buttons"""
-    text = update.message.text
-    
-    if text == "🍱 Меню":
-        await menu_handler(update, context)
-    elif text == "🛒 Корзина":
-        await cart_handler(update, context)
-    elif text == "📦 Мои заказы":
-        await orders_handler(update, context)
-    elif text == "💰 Бонусы":
-        await bonus_handler(update, context)
-    elif text == "ℹ️ О нас":
-        await about_handler(update, context)
-    elif text == "📞 Контакты":
-        await contacts_handler(update, context)
-    elif text == "⬅️ Отмена":
-        await update.message.reply_text(
-            "Действие отменено.",
-            reply_markup=get_main_menu_keyboard()
-        )
+    handler = TEXT_DISPATCH.get(update.message.text)
+    if handler:
+        await handler(update, context)
 
 
+@lru_cache(maxsize=None)
 def get_user_handlers() -> list:
-    """Get list of all user handlers"""
+    """Get list of all user handlers (built once; don't modify the returned list)"""
     
     # Conversation handler for address/phone/promocode input
     conv_handler = ConversationHandler(
@@ -1058,10 +1096,13 @@ def get_user_handlers() -> list:
         # Callback handlers
         CallbackQueryHandler(category_callback, pattern="^category_"),
         CallbackQueryHandler(product_callback, pattern="^product_"),
-        CallbackQueryHandler(quantity_callback, pattern="^qty_(minus|plus)_"),
+        CallbackQueryHandler(quantity_minus_callback, pattern="^qty_minus_"),
+        CallbackQueryHandler(quantity_plus_callback, pattern="^qty_plus_"),
         CallbackQueryHandler(add_to_cart_callback, pattern="^add_to_cart_"),
         
-        CallbackQueryHandler(cart_modify_callback, pattern="^(cart_minus|cart_plus|remove_from_cart)_"),
+        CallbackQueryHandler(cart_minus_callback, pattern="^cart_minus_"),
+        CallbackQueryHandler(cart_plus_callback, pattern="^cart_plus_"),
+        CallbackQueryHandler(remove_from_cart_callback, pattern="^remove_from_cart_"),
         CallbackQueryHandler(clear_cart_callback, pattern="^clear_cart$"),
         
         CallbackQueryHandler(checkout_callback, pattern="^checkout$"),
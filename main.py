@@ -8,12 +8,11 @@ Usage:
     3. Run: python main.py
 """
 import logging
-import yaml
 import os
 import sys
 
 from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, filters
+from telegram.ext import AIORateLimiter, Application
 
 # Configure logging
 logging.basicConfig(
@@ -27,27 +26,52 @@ logging.getLogger("httpx").setLevel(logging.WARNING)
 
 # Import handlers
 from handlers.user_handlers import get_user_handlers
-from handlers.admin_handlers import get_admin_handlers
+from handlers.admin_handlers import get_admin_handlers, resume_broadcast
+from handlers.order_handlers import stop_notifications
+from utils.config import CONFIG_PATH, load_config as read_config
+from utils.data_manager import get_data_manager
+
+# Bot API connection pool shared by all handlers
+HTTP_POOL_SIZE = 256
+HTTP_POOL_TIMEOUT = 5.0
+
+# The rate limiter only throttles; RetryAfter is retried by the broadcast and
+# notification senders, which re-queue instead of blocking the caller
+RATE_LIMIT_MAX_RETRIES = 0
 
 
 def load_config() -> dict:
     """Load configuration from config.yaml"""
-    config_path = os.path.join(os.path.dirname(__file__), 'config.yaml')
-    
-    if not os.path.exists(config_path):
+    if not os.path.exists(CONFIG_PATH):
         logger.error("config.yaml not found! Please create it with your bot token.")
         sys.exit(1)
     
-    with open(config_path, 'r', encoding='utf-8') as f:
-        config = yaml.safe_load(f)
-    
-    return config
+    # Parsed once and shared with the handlers
+    return read_config()
+
+
+async def post_init(application: Application):
+    """Start background services once the bot is running"""
+    # Off by default: with write-behind a crash can lose the last FLUSH_INTERVAL of
+    # saved orders and bonus points
+    if read_config().get('storage', {}).get('write_behind', False):
+        get_data_manager().start_write_behind()
+    await resume_broadcast(application)
+
+
+async def post_shutdown(application: Application):
+    """Deliver queued notifications and write pending data to disk"""
+    await stop_notifications(application)
+    await get_data_manager().stop_write_behind()
 
 
 async def error_handler(update: Update, context):
     """Handle errors"""
     logger.error(f"Exception while handling an update: {context.error}")
     
+    # Don't keep unwritten changes in memory after something went wrong
+    await get_data_manager().aio.flush()
+    
     # Notify user about error
     if update and update.effective_chat:
         try:
@@ -71,8 +95,22 @@ def main():
         logger.info("Get a token from @BotFather on Telegram")
         sys.exit(1)
     
-    # Create application
-    application = Application.builder().token(bot_token).build()
+    # Create application. Every handler sends through context.bot, so this
+    # single keep-alive pool serves all Bot API calls; broadcasts and
+    # notification batches may briefly hold many connections at once.
+    # The rate limiter keeps all sends under Telegram's flood limits.
+    # Updates stay sequential: the ConversationHandlers keep per-user state
+    # that is not safe when one user's updates run in parallel.
+    application = (
+        Application.builder()
+        .token(bot_token)
+        .connection_pool_size(HTTP_POOL_SIZE)
+        .pool_timeout(HTTP_POOL_TIMEOUT)
+        .rate_limiter(AIORateLimiter(max_retries=RATE_LIMIT_MAX_RETRIES))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
     
     # Add admin handlers first (higher priority)
     for handler in get_admin_handlers():
@@ -85,6 +123,9 @@ def main():
     # Add error handler
     application.add_error_handler(error_handler)
     
+    # Load order lookups before the first update arrives
+    get_data_manager().warm_cache()
+    
     # Log startup
     admin_ids = config.get('bot', {}).get('admin_ids', [])
     logger.info("=" * 50)
@@ -0,0 +1,43 @@
+"""
+Bot configuration access
+Parses config.yaml once and serves it from memory until the file changes
+"""
+import os
+from typing import Optional
+
+# Project root, so the bot finds its config whatever the working directory
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config.yaml')
+
+# (mtime_ns, parsed config) of the last parse
+_config_cache: Optional[tuple] = None
+# (config, admin IDs) derived from the last parsed config
+_admin_ids_cache: Optional[tuple] = None
+
+
+def load_config() -> dict:
+    """Load bot configuration (served from cache, parsed again only after config.yaml changes)"""
+    global _config_cache
+    mtime = os.stat(CONFIG_PATH).st_mtime_ns
+    if _config_cache is None or _config_cache[0] != mtime:
+        import yaml  # deferred until the config is first needed
+        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+            # libyaml-backed loader when PyYAML was built with it
+            config = yaml.load(f, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader)) or {}
+        _config_cache = (mtime, config)
+    return _config_cache[1]
+
+
+def get_admin_ids() -> frozenset:
+    """Get the set of admin Telegram IDs from the cached config"""
+    global _admin_ids_cache
+    config = load_config()
+    if _admin_ids_cache is None or _admin_ids_cache[0] is not config:
+        _admin_ids_cache = (config, frozenset(config.get('bot', {}).get('admin_ids', [])))
+    return _admin_ids_cache[1]
+
+
+def reload_config():
+    """Drop cached configuration so the next access re-reads config.yaml"""
+    global _config_cache, _admin_ids_cache
+    _config_cache = None
+    _admin_ids_cache = None
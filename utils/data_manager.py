@@ -1,117 +1,366 @@
 """
-Data Manager for YAML-based storage
+Data Manager for YAML-based storage (orders are kept in JSON)
 Handles all CRUD operations for users, products, orders, and promocodes
 """
-import yaml
+import asyncio
+import copy
+import json
+from collections import Counter
 from datetime import datetime
+from functools import cached_property, lru_cache, wraps
 from typing import Dict, List, Optional
 import os
-from threading import Lock
+from threading import RLock
+
+
+@lru_cache(maxsize=256)
+def _parse_date(value: str) -> datetime:
+    """Parse a YYYY-MM-DD date (memoized: the same few expiry dates are checked on every checkout)"""
+    return datetime.strptime(value, '%Y-%m-%d')
+
+
+def _locked(method):
+    """Run a read-modify-write method under the shared writer lock so threaded callers don't lose updates"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
 
 
 class DataManager:
+    # Shared by all instances: every instance reads and writes the same files
+    _lock = RLock()
+    # Per-file locks: readers of one file don't wait for a write to another
+    _file_locks: Dict[str, RLock] = {}
+    # Per-file write counters, shared by all instances in the process
+    _versions: Dict[str, int] = {}
+    # Lookups derived from a data file: {name: (stamp, value)}
+    _derived: Dict[str, tuple] = {}
+    # Parsed data files shared by readers: {filename: (stamp, data)}
+    _parsed: Dict[str, tuple] = {}
+    # Write-behind mode: saves update memory and a background task writes them to disk
+    # every FLUSH_INTERVAL seconds, so a crash can lose the last fraction of a second of changes
+    FLUSH_INTERVAL = 0.2
+    _dirty: Dict[str, Dict] = {}
+    _flusher: Optional[asyncio.Task] = None
+    # mtimes of our own flushes, mapped to the mtime the cached data is stamped with
+    _mtime_aliases: Dict[str, tuple] = {}
+    
     def __init__(self, data_dir: str = "data"):
         self.data_dir = data_dir
-        self.lock = Lock()  # For thread safety
+        self.lock = DataManager._lock  # Serializes writers (re-entrant, mutators hold it across load+save)
         
         # Create data directory if it doesn't exist
         os.makedirs(data_dir, exist_ok=True)
-    
-    def _load_yaml(self, filename: str) -> Dict:
-        """Load YAML file"""
+        self._migrate_orders()
+    
+    @cached_property
+    def aio(self) -> 'AsyncDataManager':
+        """Awaitable versions of this manager's methods, for use from handlers"""
+        return AsyncDataManager(self)
+    
+    def _migrate_orders(self):
+        """Move orders from the old orders.yaml into orders.json (kept as orders.yaml.bak)"""
+        legacy = os.path.join(self.data_dir, 'orders.yaml')
+        if os.path.exists(legacy) and not os.path.exists(os.path.join(self.data_dir, 'orders.json')):
+            self._write_file('orders.json', self._parse_file('orders.yaml'))
+            os.replace(legacy, legacy + '.bak')
+    
+    def _parse_file(self, filename: str) -> Dict:
+        """Parse data file from disk (JSON or YAML, by extension)"""
         filepath = os.path.join(self.data_dir, filename)
         if not os.path.exists(filepath):
             return {}
-        with self.lock:
+        if filename.endswith('.json'):
             with open(filepath, 'r', encoding='utf-8') as f:
-                return yaml.safe_load(f) or {}
-    
-    def _save_yaml(self, filename: str, data: Dict):
-        """Save to YAML file"""
+                return json.load(f) or {}
+        import yaml  # deferred: PyYAML is only needed once a data file is actually read
+        with open(filepath, 'r', encoding='utf-8') as f:
+            # libyaml-backed loader when PyYAML was built with it
+            return yaml.load(f, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader)) or {}
+    
+    def _stamp(self, filename: str) -> tuple:
+        """Identify the current contents of a data file"""
+        # mtime also catches edits made outside the bot
+        try:
+            mtime = os.stat(os.path.join(self.data_dir, filename)).st_mtime_ns
+        except FileNotFoundError:
+            mtime = 0
+        alias = DataManager._mtime_aliases.get(filename)
+        if alias and alias[0] == mtime:
+            mtime = alias[1]
+        return (self.get_version(filename), mtime)
+    
+    def _file_lock(self, filename: str) -> RLock:
+        """Get the lock guarding parsing and saving of one data file"""
+        lock = DataManager._file_locks.get(filename)
+        if lock is None:
+            lock = DataManager._file_locks.setdefault(filename, RLock())
+        return lock
+    
+    def _read_data(self, filename: str) -> Dict:
+        """Parsed data file shared between readers (treat as read-only), parsed again only after it changes"""
+        with self._file_lock(filename):
+            stamp = self._stamp(filename)
+            cached = DataManager._parsed.get(filename)
+            if cached is None or cached[0] != stamp:
+                cached = (stamp, self._parse_file(filename))
+                DataManager._parsed[filename] = cached
+            return cached[1]
+    
+    def _load_data(self, filename: str) -> Dict:
+        """Load data file as a private copy the caller may modify and save"""
+        return copy.deepcopy(self._read_data(filename))
+    
+    def _load_for_update(self, filename: str, key: str, field: str, value) -> tuple:
+        """Copy of a data file for changing one record: (data, record) with only the record list and
+        the matching record copied, everything else shared with readers (record is None if missing)"""
+        data = dict(self._read_data(filename))
+        records = data[key] = list(data.get(key, []))
+        for i, record in enumerate(records):
+            if record[field] == value:
+                records[i] = dict(record)
+                return data, records[i]
+        return data, None
+    
+    def _write_file(self, filename: str, data: Dict):
+        """Write data file via a temp file swapped in, so a crash never leaves it half-written"""
         filepath = os.path.join(self.data_dir, filename)
-        with self.lock:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                yaml.dump(data, f, allow_unicode=True, default_flow_style=False, sort_keys=False)
+        tmp_path = filepath + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                if filename.endswith('.json'):
+                    # Orders are written on every checkout and status change, and nobody edits them
+                    # by hand: json serializes them far faster than PyYAML
+                    json.dump(data, f, ensure_ascii=False)
+                else:
+                    import yaml
+                    # Pure-Python SafeDumper on purpose: libyaml's CSafeDumper writes emoji
+                    # (category icons, user names) as "\U0001F363" escapes
+                    yaml.dump(data, f, Dumper=yaml.SafeDumper, allow_unicode=True,
+                              default_flow_style=False, sort_keys=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, filepath)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    
+    def _save_data(self, filename: str, data: Dict, share: bool = False):
+        """Save data file (or just to memory in write-behind mode).
+        With share=True data also becomes the parsed copy readers get, so the file isn't parsed back;
+        the caller must not modify it afterwards."""
+        with self._file_lock(filename):
+            if DataManager._flusher is not None:
+                if not share:
+                    data = copy.deepcopy(data)
+                DataManager._versions[filename] = DataManager._versions.get(filename, 0) + 1
+                DataManager._dirty[filename] = data
+                DataManager._parsed[filename] = (self._stamp(filename), data)
+                return
+            # Supersedes anything a stopped write-behind mode left unwritten
+            DataManager._dirty.pop(filename, None)
+            self._write_file(filename, data)
+            DataManager._versions[filename] = DataManager._versions.get(filename, 0) + 1
+            if share:
+                DataManager._parsed[filename] = (self._stamp(filename), data)
+    
+    def flush(self):
+        """Write files saved in write-behind mode to disk"""
+        for filename in list(DataManager._dirty):
+            with self._file_lock(filename):
+                data = DataManager._dirty.pop(filename, None)
+                if data is None:
+                    continue
+                stamped_mtime = self._stamp(filename)[1]
+                self._write_file(filename, data)
+                # Our own write must not look like an outside edit and invalidate the caches
+                mtime = os.stat(os.path.join(self.data_dir, filename)).st_mtime_ns
+                DataManager._mtime_aliases[filename] = (mtime, stamped_mtime)
+    
+    async def _flush_loop(self):
+        """Write dirty files every FLUSH_INTERVAL seconds"""
+        while True:
+            await asyncio.sleep(self.FLUSH_INTERVAL)
+            if DataManager._dirty:
+                await asyncio.to_thread(self.flush)
+    
+    def start_write_behind(self):
+        """Switch to write-behind mode (opt-in via storage.write_behind; needs a running event loop)"""
+        if DataManager._flusher is None:
+            DataManager._flusher = asyncio.get_running_loop().create_task(self._flush_loop())
+    
+    async def stop_write_behind(self):
+        """Stop the background writer and write out everything still pending (used on shutdown)"""
+        flusher, DataManager._flusher = DataManager._flusher, None
+        if flusher is not None:
+            flusher.cancel()
+            try:
+                await flusher
+            except asyncio.CancelledError:
+                pass
+        await asyncio.to_thread(self.flush)
+    
+    @staticmethod
+    def _is_current(record: Dict, updates: Dict) -> bool:
+        """Tell whether a record already holds all the given values"""
+        return all(key in record and record[key] == value for key, value in updates.items())
+    
+    @classmethod
+    def _apply_updates(cls, record: Dict, updates: Dict) -> bool:
+        """Apply updates to a record, telling whether anything actually changed"""
+        if cls._is_current(record, updates):
+            return False
+        record.update(updates)
+        return True
+    
+    def get_version(self, filename: str) -> int:
+        """Get write counter for a data file (changes on every save)"""
+        return DataManager._versions.get(filename, 0)
+    
+    def _derive(self, filename: str, name: str, build) -> Dict:
+        """Get a lookup built from a data file, rebuilt only after the file changes"""
+        stamp = self._stamp(filename)
+        cached = DataManager._derived.get(name)
+        if cached is None or cached[0] != stamp:
+            cached = (stamp, build(self._read_data(filename)))
+            DataManager._derived[name] = cached
+        return cached[1]
+    
+    def warm_cache(self):
+        """Build in-memory lookups up front so the first requests don't pay for parsing"""
+        self._derive('orders.json', 'orders_by_id', self._build_id_index)
+        self._derive('orders.json', 'orders_by_date', self._build_date_index)
+        self._derive('orders.json', 'orders_by_user', self._build_user_orders_index)
+        self._derive('users.yaml', 'users_by_id', self._build_user_index)
+        self._derive('products.yaml', 'catalog', self._build_catalog)
+    
+    # ==================== Catalog ====================
+    @staticmethod
+    def _build_catalog(data: Dict) -> Dict:
+        """Index products.yaml: categories and products by ID, available products per category"""
+        categories = data.get('categories', [])
+        products = data.get('products', [])
+        categories_by_id = {}
+        for category in categories:
+            categories_by_id.setdefault(category['id'], category)
+        products_by_id = {}
+        available = []
+        available_by_category = {}
+        for product in products:
+            products_by_id.setdefault(product['id'], product)
+            if product.get('available', True):
+                available.append(product)
+                available_by_category.setdefault(product['category_id'], []).append(product)
+        return {
+            'categories': categories,
+            'categories_by_id': categories_by_id,
+            'products': products,
+            'products_by_id': products_by_id,
+            'available': available,
+            'available_by_category': available_by_category
+        }
+    
+    @property
+    def catalog_version(self) -> tuple:
+        """Stamp of products.yaml (write counter and mtime), for caching views built from the catalog"""
+        # mtime makes hand edits of products.yaml invalidate those views too
+        return self._stamp('products.yaml')
+    
+    def _catalog(self) -> Dict:
+        """Catalog lookups, shared between calls: treat results as read-only"""
+        return self._derive('products.yaml', 'catalog', self._build_catalog)
     
     # ==================== Categories ====================
     def get_categories(self) -> List[Dict]:
         """Get all product categories"""
-        data = self._load_yaml('products.yaml')
-        return data.get('categories', [])
+        return self._catalog()['categories']
     
     def get_category(self, category_id: int) -> Optional[Dict]:
         """Get a single category by ID"""
-        categories = self.get_categories()
-        return next((c for c in categories if c['id'] == category_id), None)
+        return self._catalog()['categories_by_id'].get(category_id)
     
     # ==================== Products ====================
     def get_products(self, category_id: Optional[int] = None) -> List[Dict]:
         """Get products, optionally filtered by category"""
-        data = self._load_yaml('products.yaml')
-        products = data.get('products', [])
+        catalog = self._catalog()
         if category_id:
-            return [p for p in products if p['category_id'] == category_id and p.get('available', True)]
-        return [p for p in products if p.get('available', True)]
+            return catalog['available_by_category'].get(category_id, [])
+        return catalog['available']
     
     def get_all_products(self) -> List[Dict]:
         """Get all products including unavailable ones"""
-        data = self._load_yaml('products.yaml')
-        return data.get('products', [])
+        return self._catalog()['products']
     
     def get_product(self, product_id: int) -> Optional[Dict]:
         """Get a single product by ID"""
-        data = self._load_yaml('products.yaml')
-        products = data.get('products', [])
-        return next((p for p in products if p['id'] == product_id), None)
+        return self._catalog()['products_by_id'].get(product_id)
     
+    def get_products_by_ids(self, product_ids: List[int]) -> Dict[int, Dict]:
+        """Get several products by ID in one lookup (missing IDs are left out)"""
+        index = self._catalog()['products_by_id']
+        return {i: index[i] for i in product_ids if i in index}
+    
+    @_locked
     def add_product(self, product: Dict) -> int:
         """Add a new product"""
-        data = self._load_yaml('products.yaml')
+        data = self._load_data('products.yaml')
         if 'products' not in data:
             data['products'] = []
         product_id = max([p['id'] for p in data['products']], default=0) + 1
         product['id'] = product_id
         data['products'].append(product)
-        self._save_yaml('products.yaml', data)
+        self._save_data('products.yaml', data)
         return product_id
     
+    @_locked
     def update_product(self, product_id: int, updates: Dict):
         """Update an existing product"""
-        data = self._load_yaml('products.yaml')
-        products = data.get('products', [])
-        for product in products:
-            if product['id'] == product_id:
-                product.update(updates)
-                break
-        self._save_yaml('products.yaml', data)
+        # Checked against the index first: no file copy for unknown IDs or no-op updates
+        current = self.get_product(product_id)
+        if current is None or self._is_current(current, updates):
+            return
+        data, product = self._load_for_update('products.yaml', 'products', 'id', product_id)
+        # Re-saving unchanged data would also invalidate every catalog cache
+        if product is not None and self._apply_updates(product, updates):
+            self._save_data('products.yaml', data, share=True)
     
     def delete_product(self, product_id: int):
         """Delete a product (set available to false)"""
         self.update_product(product_id, {'available': False})
     
     # ==================== Users ====================
+    @staticmethod
+    def _build_user_index(data: Dict) -> Dict[int, Dict]:
+        """Map Telegram ID to user (first record wins, as with a linear search)"""
+        index = {}
+        for user in data.get('users', []):
+            index.setdefault(user['telegram_id'], user)
+        return index
+    
     def get_user(self, telegram_id: int) -> Optional[Dict]:
         """Get user by Telegram ID"""
-        data = self._load_yaml('users.yaml')
-        users = data.get('users', [])
-        return next((u for u in users if u['telegram_id'] == telegram_id), None)
+        return self._derive('users.yaml', 'users_by_id', self._build_user_index).get(telegram_id)
     
     def get_all_users(self) -> List[Dict]:
         """Get all users"""
-        data = self._load_yaml('users.yaml')
+        data = self._read_data('users.yaml')
         return data.get('users', [])
     
+    @_locked
     def create_user(self, telegram_id: int, username: str = None, first_name: str = None) -> Dict:
         """Create a new user"""
-        data = self._load_yaml('users.yaml')
-        if 'users' not in data:
-            data['users'] = []
-        
         # Check if user already exists
-        existing = next((u for u in data['users'] if u['telegram_id'] == telegram_id), None)
+        existing = self.get_user(telegram_id)
         if existing:
             return existing
         
+        data = self._load_data('users.yaml')
+        if 'users' not in data:
+            data['users'] = []
+        
         new_user = {
             'telegram_id': telegram_id,
             'username': username,
@@ -123,28 +372,42 @@ class DataManager:
             'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
         data['users'].append(new_user)
-        self._save_yaml('users.yaml', data)
+        self._save_data('users.yaml', data)
         return new_user
     
+    @_locked
     def update_user(self, telegram_id: int, updates: Dict):
         """Update user data"""
-        data = self._load_yaml('users.yaml')
-        users = data.get('users', [])
-        for user in users:
-            if user['telegram_id'] == telegram_id:
-                user.update(updates)
-                break
-        self._save_yaml('users.yaml', data)
-    
+        current = self.get_user(telegram_id)
+        if current is None or self._is_current(current, updates):
+            return
+        data, user = self._load_for_update('users.yaml', 'users', 'telegram_id', telegram_id)
+        if user is not None and self._apply_updates(user, updates):
+            self._save_data('users.yaml', data, share=True)
+    
+    @_locked
+    def mark_blocked(self, telegram_ids: set):
+        """Flag users who blocked the bot so broadcasts skip them"""
+        data = self._load_data('users.yaml')
+        changed = False
+        for user in data.get('users', []):
+            if user['telegram_id'] in telegram_ids and not user.get('blocked'):
+                user['blocked'] = True
+                changed = True
+        if changed:
+            self._save_data('users.yaml', data)
+    
+    @_locked
     def add_user_address(self, telegram_id: int, address: str):
         """Add address to user's saved addresses"""
         user = self.get_user(telegram_id)
         if user:
             addresses = user.get('addresses', [])
             if address not in addresses:
-                addresses.append(address)
-                self.update_user(telegram_id, {'addresses': addresses})
+                # New list: the user record is shared with other readers
+                self.update_user(telegram_id, {'addresses': addresses + [address]})
     
+    @_locked
     def add_bonus_points(self, telegram_id: int, points: int):
         """Add bonus points to user"""
         user = self.get_user(telegram_id)
@@ -153,96 +416,215 @@ class DataManager:
             self.update_user(telegram_id, {'bonus_points': current_points + points})
     
     # ==================== Orders ====================
+    @_locked
     def create_order(self, order_data: Dict) -> int:
         """Create a new order"""
-        data = self._load_yaml('orders.yaml')
-        if 'orders' not in data:
-            data['orders'] = []
+        # Copy-on-write: only the orders list is copied, stored orders stay shared with readers
+        data = dict(self._read_data('orders.json'))
+        orders = data['orders'] = list(data.get('orders', []))
         
-        order_id = max([o['id'] for o in data['orders']], default=0) + 1
+        order_id = max([o['id'] for o in orders], default=0) + 1
         
         order_data['id'] = order_id
         order_data['status'] = 'new'
         order_data['created_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
-        data['orders'].append(order_data)
-        self._save_yaml('orders.yaml', data)
+        # The caller keeps order_data, so the stored order is a copy of it
+        orders.append(copy.deepcopy(order_data))
+        self._save_data('orders.json', data, share=True)
         
-        # Update user statistics
-        user = self.get_user(order_data['user_id'])
-        if user:
-            self.update_user(order_data['user_id'], {
-                'total_orders': user.get('total_orders', 0) + 1
-            })
+        # Update user statistics and bonus points in one users.yaml write
+        users, user = self._load_for_update('users.yaml', 'users', 'telegram_id', order_data['user_id'])
+        if user is not None:
+            user['total_orders'] = user.get('total_orders', 0) + 1
             # Add bonus points (1% of order total)
             bonus = int(order_data.get('total', 0) * 0.01)
             if bonus > 0:
-                self.add_bonus_points(order_data['user_id'], bonus)
+                user['bonus_points'] = user.get('bonus_points', 0) + bonus
+            self._save_data('users.yaml', users, share=True)
         
         # Update statistics
         self._update_statistics(order_data.get('total', 0))
         
         return order_id
     
+    @staticmethod
+    def _build_id_index(data: Dict) -> Dict[int, Dict]:
+        """Map order ID to order"""
+        return {o['id']: o for o in data.get('orders', [])}
+    
     def get_order(self, order_id: int) -> Optional[Dict]:
-        """Get order by ID"""
-        data = self._load_yaml('orders.yaml')
-        orders = data.get('orders', [])
-        return next((o for o in orders if o['id'] == order_id), None)
+        """Get order by ID (shared in-memory copy, don't modify)"""
+        return self._derive('orders.json', 'orders_by_id', self._build_id_index).get(order_id)
+    
+    @staticmethod
+    def _sort_newest_first(orders: List[Dict]) -> List[Dict]:
+        """Orders sorted by creation time, newest first"""
+        return sorted(orders, key=lambda x: x['created_at'], reverse=True)
+    
+    def _orders_newest_first(self) -> List[Dict]:
+        """All orders newest first, sorted once per orders.json change (shared, don't modify)"""
+        return self._derive('orders.json', 'orders_newest_first',
+                            lambda data: self._sort_newest_first(data.get('orders', [])))
+    
+    def _build_user_orders_index(self, data: Dict) -> Dict[int, List[Dict]]:
+        """Group orders by user, newest first"""
+        index = {}
+        for order in self._orders_newest_first():
+            index.setdefault(order['user_id'], []).append(order)
+        return index
     
     def get_user_orders(self, telegram_id: int) -> List[Dict]:
         """Get all orders for a user"""
-        data = self._load_yaml('orders.yaml')
-        orders = data.get('orders', [])
-        return sorted(
-            [o for o in orders if o['user_id'] == telegram_id],
-            key=lambda x: x['created_at'],
-            reverse=True
-        )
+        index = self._derive('orders.json', 'orders_by_user', self._build_user_orders_index)
+        return list(index.get(telegram_id, []))
     
     def get_all_orders(self, status: Optional[str] = None) -> List[Dict]:
         """Get all orders, optionally filtered by status"""
-        data = self._load_yaml('orders.yaml')
+        data = self._read_data('orders.json')
         orders = data.get('orders', [])
         if status:
             return [o for o in orders if o['status'] == status]
-        return sorted(orders, key=lambda x: x['created_at'], reverse=True)
+        return list(self._orders_newest_first())
     
     def get_pending_orders(self) -> List[Dict]:
         """Get orders that need attention (not delivered or cancelled)"""
-        data = self._load_yaml('orders.yaml')
-        orders = data.get('orders', [])
-        return sorted(
-            [o for o in orders if o['status'] not in ('delivered', 'cancelled')],
-            key=lambda x: x['created_at'],
-            reverse=True
-        )
+        # Filtered from the already sorted list, so no sort of its own
+        pending = self._derive('orders.json', 'pending_orders',
+                               lambda data: [o for o in self._orders_newest_first() if self._is_pending(o)])
+        return list(pending)
+    
+    @staticmethod
+    def _is_pending(order: Dict) -> bool:
+        """Tell whether an order still needs attention"""
+        return order['status'] not in ('delivered', 'cancelled')
+    
+    def get_status_counts(self) -> Dict[str, int]:
+        """Count orders by status"""
+        counts = self._derive('orders.json', 'status_counts',
+                              lambda data: Counter(o['status'] for o in data.get('orders', [])))
+        return dict(counts)
+    
+    @staticmethod
+    def _build_date_index(data: Dict) -> Dict[str, Dict]:
+        """Group orders by creation date: {'YYYY-MM-DD': {'orders': [...], 'revenue': ...}}"""
+        index = {}
+        for order in data.get('orders', []):
+            day = index.setdefault(order['created_at'][:10], {'orders': [], 'revenue': 0})
+            day['orders'].append(order)
+            day['revenue'] += order['total']
+        return index
+    
+    def get_today_totals(self) -> Dict:
+        """Get number of orders and revenue for today"""
+        today = datetime.now().strftime('%Y-%m-%d')
+        day = self._derive('orders.json', 'orders_by_date', self._build_date_index).get(today)
+        if not day:
+            return {'orders': 0, 'revenue': 0}
+        return {'orders': len(day['orders']), 'revenue': day['revenue']}
+    
+    @staticmethod
+    def summarize_orders(orders: List[Dict]) -> Dict:
+        """Totals, completed count and per-status count/revenue for an orders list"""
+        if not orders:
+            return {
+                'total_orders': 0,
+                'total_revenue': 0,
+                'average_order': 0,
+                'by_status': {}
+            }
+        
+        # Single pass over orders for all aggregates
+        total_revenue = 0
+        completed_orders = 0
+        by_status = {}
+        for order in orders:
+            status = order['status']
+            total = order['total']
+            if status != 'cancelled':
+                total_revenue += total
+                if status == 'delivered':
+                    completed_orders += 1
+            group = by_status.get(status)
+            if group is None:
+                group = by_status[status] = {'count': 0, 'revenue': 0}
+            group['count'] += 1
+            group['revenue'] += total
+        
+        return {
+            'total_orders': len(orders),
+            'total_revenue': total_revenue,
+            'average_order': total_revenue / len(orders),
+            'completed_orders': completed_orders,
+            'by_status': by_status
+        }
+    
+    def get_order_statistics(self) -> Dict:
+        """Statistics over all orders, recomputed only after orders change (don't modify)"""
+        return self._derive('orders.json', 'order_statistics',
+                            lambda data: self.summarize_orders(data.get('orders', [])))
     
+    @_locked
     def update_order_status(self, order_id: int, status: str):
         """Update order status"""
-        data = self._load_yaml('orders.yaml')
-        orders = data.get('orders', [])
-        for order in orders:
-            if order['id'] == order_id:
-                order['status'] = status
-                if status == 'delivered':
-                    order['delivered_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                break
-        self._save_yaml('orders.yaml', data)
+        data, order = self._load_for_update('orders.json', 'orders', 'id', order_id)
+        if order is not None:
+            self._apply_order_status(order, status)
+            self._save_data('orders.json', data, share=True)
+    
+    @_locked
+    def update_order_status_and_get_pending(self, order_id: int, status: str) -> List[Dict]:
+        """Update order status and return the refreshed pending orders in the same pass"""
+        self.update_order_status(order_id, status)
+        # Built from the saved data kept in memory, not a re-parse
+        return self.get_pending_orders()
+    
+    @staticmethod
+    def _apply_order_status(order: Dict, status: str):
+        """Set status on an order copied for update"""
+        order['status'] = status
+        if status == 'delivered':
+            order['delivered_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     
     # ==================== Promocodes ====================
+    @staticmethod
+    def _build_promocode_index(data: Dict) -> Dict[str, List[Dict]]:
+        """Group promocodes by upper-cased code, in file order"""
+        index = {}
+        for promo in data.get('promocodes', []):
+            index.setdefault(promo['code'].upper(), []).append(promo)
+        return index
+    
+    @staticmethod
+    def _build_promocode_positions(data: Dict) -> Dict[str, int]:
+        """Map upper-cased code to the position of its first promocode in the file"""
+        positions = {}
+        for i, promo in enumerate(data.get('promocodes', [])):
+            positions.setdefault(promo['code'].upper(), i)
+        return positions
+    
+    def _find_promocode(self, data: Dict, code: str) -> Optional[Dict]:
+        """Find the first promocode with a code in a loaded copy of promocodes.yaml"""
+        key = code.upper()
+        promocodes = data.get('promocodes', [])
+        i = self._derive('promocodes.yaml', 'promocode_positions', self._build_promocode_positions).get(key)
+        if i is not None and i < len(promocodes) and promocodes[i]['code'].upper() == key:
+            return promocodes[i]
+        # File changed between indexing and loading: fall back to a scan
+        return next((p for p in promocodes if p['code'].upper() == key), None)
+    
+    def _promocodes_for(self, code: str) -> List[Dict]:
+        """Promocodes stored under a code (case-insensitive)"""
+        index = self._derive('promocodes.yaml', 'promocodes_by_code', self._build_promocode_index)
+        return index.get(code.upper(), [])
+    
     def get_promocode(self, code: str) -> Optional[Dict]:
         """Get promocode by code"""
-        data = self._load_yaml('promocodes.yaml')
-        promocodes = data.get('promocodes', [])
-        return next((p for p in promocodes if p['code'].upper() == code.upper()), None)
+        return next(iter(self._promocodes_for(code)), None)
     
     def check_promocode(self, code: str, order_total: float) -> Optional[Dict]:
         """Check if promocode is valid for order total"""
-        data = self._load_yaml('promocodes.yaml')
-        promocodes = data.get('promocodes', [])
-        
-        promo = next((p for p in promocodes if p['code'].upper() == code.upper() and p['active']), None)
+        promo = next((p for p in self._promocodes_for(code) if p['active']), None)
         
         if promo:
             # Check minimum order
@@ -250,7 +632,7 @@ class DataManager:
                 return None
             
             # Check expiry
-            expiry = datetime.strptime(promo['expiry_date'], '%Y-%m-%d')
+            expiry = _parse_date(promo['expiry_date'])
             if datetime.now() > expiry:
                 return None
             
@@ -272,53 +654,78 @@ class DataManager:
             return min(promo['discount_fixed'], order_total)
         return 0
     
+    @_locked
     def use_promocode(self, code: str):
         """Increment promocode usage count"""
-        data = self._load_yaml('promocodes.yaml')
-        promocodes = data.get('promocodes', [])
-        for promo in promocodes:
-            if promo['code'].upper() == code.upper():
-                promo['current_uses'] = promo.get('current_uses', 0) + 1
-                break
-        self._save_yaml('promocodes.yaml', data)
+        if not self._promocodes_for(code):
+            return
+        data = self._load_data('promocodes.yaml')
+        promo = self._find_promocode(data, code)
+        if promo:
+            promo['current_uses'] = promo.get('current_uses', 0) + 1
+            self._save_data('promocodes.yaml', data)
     
     def get_all_promocodes(self) -> List[Dict]:
         """Get all promocodes"""
-        data = self._load_yaml('promocodes.yaml')
+        data = self._read_data('promocodes.yaml')
         return data.get('promocodes', [])
     
+    @_locked
     def add_promocode(self, promo_data: Dict):
         """Add a new promocode"""
-        data = self._load_yaml('promocodes.yaml')
+        data = self._load_data('promocodes.yaml')
         if 'promocodes' not in data:
             data['promocodes'] = []
         data['promocodes'].append(promo_data)
-        self._save_yaml('promocodes.yaml', data)
+        self._save_data('promocodes.yaml', data)
     
+    @_locked
     def update_promocode(self, code: str, updates: Dict):
         """Update promocode"""
-        data = self._load_yaml('promocodes.yaml')
-        promocodes = data.get('promocodes', [])
-        for promo in promocodes:
-            if promo['code'].upper() == code.upper():
-                promo.update(updates)
-                break
-        self._save_yaml('promocodes.yaml', data)
+        current = self.get_promocode(code)
+        if current is None or self._is_current(current, updates):
+            return
+        data = self._load_data('promocodes.yaml')
+        promo = self._find_promocode(data, code)
+        if promo and self._apply_updates(promo, updates):
+            self._save_data('promocodes.yaml', data)
+    
+    # ==================== Broadcasts ====================
+    def get_broadcast(self) -> Optional[Dict]:
+        """Get the unfinished broadcast, if any"""
+        data = self._load_data('broadcast.yaml')
+        return data.get('broadcast')
+    
+    def save_broadcast(self, broadcast: Dict):
+        """Save broadcast progress (message, pending recipients, counters)"""
+        self._save_data('broadcast.yaml', {'broadcast': broadcast})
+    
+    def clear_broadcast(self):
+        """Remove the finished broadcast"""
+        self._save_data('broadcast.yaml', {})
     
     # ==================== Settings ====================
     def get_settings(self) -> Dict:
-        """Get restaurant settings"""
-        return self._load_yaml('settings.yaml')
+        """Get restaurant settings (shared between calls: treat as read-only)"""
+        return self._derive('settings.yaml', 'settings', lambda data: data)
     
+    @property
+    def settings_version(self) -> tuple:
+        """Stamp of settings.yaml (write counter and mtime), for caching texts built from it"""
+        return self._stamp('settings.yaml')
+    
+    @_locked
     def update_settings(self, updates: Dict):
         """Update settings"""
-        data = self._load_yaml('settings.yaml')
-        data.update(updates)
-        self._save_yaml('settings.yaml', data)
+        data = self._load_data('settings.yaml')
+        if self._apply_updates(data, updates):
+            self._save_data('settings.yaml', data)
     
+    @_locked
     def _update_statistics(self, order_total: float):
         """Update sales statistics"""
-        settings = self.get_settings()
+        # Only the statistics section changes: copy the top level, share the rest with readers
+        settings = dict(self._read_data('settings.yaml'))
         stats = settings.get('statistics', {})
         
         total_orders = stats.get('total_orders', 0) + 1
@@ -330,7 +737,7 @@ class DataManager:
             'total_revenue': total_revenue,
             'average_order': round(average_order, 2)
         }
-        self._save_yaml('settings.yaml', settings)
+        self._save_data('settings.yaml', settings, share=True)
     
     def get_statistics(self) -> Dict:
         """Get sales statistics"""
@@ -340,3 +747,27 @@ class DataManager:
             'total_revenue': 0,
             'average_order': 0
         })
+
+
+class AsyncDataManager:
+    """Runs DataManager methods in worker threads so file I/O doesn't block the event loop"""
+    
+    def __init__(self, manager: DataManager):
+        self._manager = manager
+    
+    def __getattr__(self, name: str):
+        method = getattr(self._manager, name)
+        
+        @wraps(method)
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+        
+        # Cache the wrapper: __getattr__ only runs for names not set yet
+        setattr(self, name, call)
+        return call
+
+
+@lru_cache(maxsize=None)
+def get_data_manager() -> DataManager:
+    """Shared DataManager, created on first use"""
+    return DataManager()
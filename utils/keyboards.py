@@ -2,76 +2,137 @@
 Keyboard utilities for Telegram bot
 Creates inline and reply keyboards for menu navigation
 """
+from functools import lru_cache
+import json
+from itertools import islice
+import unicodedata
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
-from typing import List, Dict, Optional
+from typing import Iterable, List, Dict, Tuple
+
+
+# Markups are immutable, so keyboards that depend only on hashable arguments
+# are built once and shared between updates.
+
+
+class _PreparedPayload:
+    """Mixin for frozen markups: serializes the Bot API payload once and keeps it as JSON"""
+    __slots__ = ()
+    
+    def to_dict(self, recursive: bool = True) -> Dict:
+        if not recursive:
+            return super().to_dict(recursive=False)
+        # A fresh dict per call: the markup is shared, and callers may modify what they get
+        return json.loads(self.to_json())
+    
+    def to_json(self, *args, **kwargs) -> str:
+        if args or kwargs:
+            return json.dumps(super().to_dict(), *args, **kwargs)
+        try:
+            return self._payload
+        except AttributeError:
+            self._payload = json.dumps(super().to_dict())
+            return self._payload
+
+
+class PreparedInlineKeyboardMarkup(_PreparedPayload, InlineKeyboardMarkup):
+    """Inline keyboard that builds its Bot API payload once, however often it is sent"""
+    __slots__ = ('_payload',)
+
+
+class PreparedReplyKeyboardMarkup(_PreparedPayload, ReplyKeyboardMarkup):
+    """Reply keyboard that builds its Bot API payload once, however often it is sent"""
+    __slots__ = ('_payload',)
+
+
+# Characters that belong to the preceding character: ZWJ, variation selectors, skin tones, tags
+_JOINERS = frozenset('\u200d\ufe0e\ufe0f') | frozenset(map(chr, range(0x1F3FB, 0x1F400))) \
+    | frozenset(map(chr, range(0xE0020, 0xE0080)))
+
+
+def _attached(char: str) -> bool:
+    """Tell whether a character only modifies the one before it"""
+    return char in _JOINERS or unicodedata.combining(char) > 0
+
+
+@lru_cache(maxsize=1024)
+def truncate(text: str, limit: int, suffix: str = "") -> str:
+    """Shorten text to about limit characters without splitting an emoji or accented letter"""
+    if len(text) <= limit:
+        return text
+    end = limit
+    # Back off while the cut would separate a character from its modifiers or a ZWJ sequence
+    while end > 0 and (_attached(text[end]) or text[end - 1] == '\u200d'):
+        end -= 1
+    return text[:end] + suffix
 
 
 # ==================== Main Menu ====================
+# Reply keyboard labels, row by row; the handlers match incoming texts against them
+MAIN_MENU_LABELS = (
+    ("🍱 Меню", "🛒 Корзина"),
+    ("📦 Мои заказы", "💰 Бонусы"),
+    ("ℹ️ О нас", "📞 Контакты"),
+)
+
+ADMIN_MENU_LABELS = (
+    ("📋 Активные заказы", "📊 Статистика"),
+    ("🍣 Управление меню", "🎟 Промокоды"),
+    ("👥 Пользователи", "📢 Рассылка"),
+    ("⬅️ Выход из админки",),
+)
+
+
+def _reply_keyboard(labels: Tuple[Tuple[str, ...], ...]) -> ReplyKeyboardMarkup:
+    """Resizable reply keyboard with one button per label"""
+    return PreparedReplyKeyboardMarkup(
+        tuple(tuple(KeyboardButton(label) for label in row) for row in labels),
+        resize_keyboard=True
+    )
+
+
+@lru_cache(maxsize=None)
 def get_main_menu_keyboard() -> ReplyKeyboardMarkup:
     """Main menu keyboard for customers"""
-    keyboard = [
-        [KeyboardButton("🍱 Меню"), KeyboardButton("🛒 Корзина")],
-        [KeyboardButton("📦 Мои заказы"), KeyboardButton("💰 Бонусы")],
-        [KeyboardButton("ℹ️ О нас"), KeyboardButton("📞 Контакты")]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    return _reply_keyboard(MAIN_MENU_LABELS)
 
 
+@lru_cache(maxsize=None)
 def get_admin_menu_keyboard() -> ReplyKeyboardMarkup:
     """Admin panel keyboard"""
-    keyboard = [
-        [KeyboardButton("📋 Активные заказы"), KeyboardButton("📊 Статистика")],
-        [KeyboardButton("🍣 Управление меню"), KeyboardButton("🎟 Промокоды")],
-        [KeyboardButton("👥 Пользователи"), KeyboardButton("📢 Рассылка")],
-        [KeyboardButton("⬅️ Выход из админки")]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    return _reply_keyboard(ADMIN_MENU_LABELS)
 
 
 # ==================== Categories ====================
 def get_categories_keyboard(categories: List[Dict]) -> InlineKeyboardMarkup:
     """Keyboard with product categories"""
-    buttons = []
-    for category in categories:
-        emoji = category.get('emoji', '')
-        name = category['name']
-        buttons.append([InlineKeyboardButton(
-            f"{emoji} {name}",
-            callback_data=f"category_{category['id']}"
-        )])
-    buttons.append([InlineKeyboardButton("⬅️ Назад", callback_data="back_to_main")])
-    return InlineKeyboardMarkup(buttons)
+    # One-button rows as tuples: the markup stores rows as tuples anyway
+    buttons = [
+        (InlineKeyboardButton(f"{c.get('emoji', '')} {c['name']}", callback_data=f"category_{c['id']}"),)
+        for c in categories
+    ]
+    buttons.append((InlineKeyboardButton("⬅️ Назад", callback_data="back_to_main"),))
+    return PreparedInlineKeyboardMarkup(buttons)
 
 
 # ==================== Products ====================
 def get_products_keyboard(products: List[Dict], category_id: int) -> InlineKeyboardMarkup:
     """Keyboard with products in a category"""
-    buttons = []
-    for product in products:
-        name = product['name']
-        price = product['price']
-        buttons.append([InlineKeyboardButton(
-            f"{name} - {price}₽",
-            callback_data=f"product_{product['id']}"
-        )])
-    buttons.append([InlineKeyboardButton("⬅️ К категориям", callback_data="back_to_categories")])
-    return InlineKeyboardMarkup(buttons)
+    buttons = [
+        (InlineKeyboardButton(f"{p['name']} - {p['price']}₽", callback_data=f"product_{p['id']}"),)
+        for p in products
+    ]
+    buttons.append((InlineKeyboardButton("⬅️ К категориям", callback_data="back_to_categories"),))
+    return PreparedInlineKeyboardMarkup(buttons)
 
 
 def get_product_detail_keyboard(product_id: int) -> InlineKeyboardMarkup:
     """Keyboard for product detail view"""
-    buttons = [
-        [
-            InlineKeyboardButton("➖", callback_data=f"qty_minus_{product_id}"),
-            InlineKeyboardButton("1", callback_data=f"qty_show_{product_id}"),
-            InlineKeyboardButton("➕", callback_data=f"qty_plus_{product_id}")
-        ],
-        [InlineKeyboardButton("🛒 Добавить в корзину", callback_data=f"add_to_cart_{product_id}")],
-        [InlineKeyboardButton("⬅️ Назад", callback_data=f"back_to_products")]
-    ]
-    return InlineKeyboardMarkup(buttons)
+    # Same markup as quantity 1, so both views share one cache entry
+    return get_product_quantity_keyboard(product_id, 1)
 
 
+# Sized for a whole catalog at the usual quantities
+@lru_cache(maxsize=2048)
 def get_product_quantity_keyboard(product_id: int, quantity: int) -> InlineKeyboardMarkup:
     """Keyboard with current quantity for product"""
     buttons = [
@@ -83,39 +144,50 @@ def get_product_quantity_keyboard(product_id: int, quantity: int) -> InlineKeybo
         [InlineKeyboardButton("🛒 Добавить в корзину", callback_data=f"add_to_cart_{product_id}")],
         [InlineKeyboardButton("⬅️ Назад", callback_data=f"back_to_products")]
     ]
-    return InlineKeyboardMarkup(buttons)
+    return PreparedInlineKeyboardMarkup(buttons)
 
 
 # ==================== Cart ====================
-def get_cart_keyboard(cart_items: List[Dict], has_items: bool = True) -> InlineKeyboardMarkup:
+# Buttons are immutable too, so the fixed cart rows are shared by every cart keyboard
+_CART_ACTION_ROWS = (
+    (InlineKeyboardButton("🗑 Очистить корзину", callback_data="clear_cart"),),
+    (InlineKeyboardButton("✅ Оформить заказ", callback_data="checkout"),),
+)
+_CONTINUE_SHOPPING_ROW = (InlineKeyboardButton("🍱 Продолжить покупки", callback_data="continue_shopping"),)
+
+
+@lru_cache(maxsize=1024)
+def _cart_item_row(product_id: int, product_name: str, quantity: int) -> tuple:
+    """Cart row for one item; re-renders after a +/- press rebuild only the changed item"""
+    return (
+        InlineKeyboardButton(f"❌ {truncate(product_name, 20)}", callback_data=f"remove_from_cart_{product_id}"),
+        InlineKeyboardButton("➖", callback_data=f"cart_minus_{product_id}"),
+        InlineKeyboardButton(str(quantity), callback_data="noop"),
+        InlineKeyboardButton("➕", callback_data=f"cart_plus_{product_id}")
+    )
+
+
+def get_cart_keyboard(cart_items: Iterable[Dict], has_items: bool = True) -> InlineKeyboardMarkup:
     """Cart management keyboard"""
-    buttons = []
-    
-    if has_items:
-        for item in cart_items:
-            product_name = item['product_name'][:20]
-            buttons.append([
-                InlineKeyboardButton(f"❌ {product_name}", callback_data=f"remove_from_cart_{item['product_id']}"),
-                InlineKeyboardButton("➖", callback_data=f"cart_minus_{item['product_id']}"),
-                InlineKeyboardButton(str(item['quantity']), callback_data="noop"),
-                InlineKeyboardButton("➕", callback_data=f"cart_plus_{item['product_id']}")
-            ])
-        buttons.append([InlineKeyboardButton("🗑 Очистить корзину", callback_data="clear_cart")])
-        buttons.append([InlineKeyboardButton("✅ Оформить заказ", callback_data="checkout")])
-    
-    buttons.append([InlineKeyboardButton("🍱 Продолжить покупки", callback_data="continue_shopping")])
-    return InlineKeyboardMarkup(buttons)
+    if not has_items:
+        return PreparedInlineKeyboardMarkup((_CONTINUE_SHOPPING_ROW,))
+    buttons = [_cart_item_row(i['product_id'], i['product_name'], i['quantity']) for i in cart_items]
+    buttons.extend(_CART_ACTION_ROWS)
+    buttons.append(_CONTINUE_SHOPPING_ROW)
+    return PreparedInlineKeyboardMarkup(buttons)
 
 
+@lru_cache(maxsize=None)
 def get_empty_cart_keyboard() -> InlineKeyboardMarkup:
     """Keyboard for empty cart"""
     buttons = [
         [InlineKeyboardButton("🍱 Перейти в меню", callback_data="go_to_menu")]
     ]
-    return InlineKeyboardMarkup(buttons)
+    return PreparedInlineKeyboardMarkup(buttons)
 
 
 # ==================== Checkout ====================
+@lru_cache(maxsize=None)
 def get_checkout_keyboard() -> InlineKeyboardMarkup:
     """Checkout confirmation keyboard"""
     buttons = [
@@ -124,9 +196,10 @@ def get_checkout_keyboard() -> InlineKeyboardMarkup:
         [InlineKeyboardButton("🎟 Применить промокод", callback_data="apply_promocode")],
         [InlineKeyboardButton("⬅️ Назад к корзине", callback_data="back_to_cart")]
     ]
-    return InlineKeyboardMarkup(buttons)
+    return PreparedInlineKeyboardMarkup(buttons)
 
 
+@lru_cache(maxsize=None)
 def get_payment_method_keyboard() -> InlineKeyboardMarkup:
     """Payment method selection keyboard"""
     buttons = [
@@ -135,117 +208,156 @@ def get_payment_method_keyboard() -> InlineKeyboardMarkup:
         [InlineKeyboardButton("🌐 Онлайн оплата", callback_data="pay_online")],
         [InlineKeyboardButton("⬅️ Назад", callback_data="back_to_checkout")]
     ]
-    return InlineKeyboardMarkup(buttons)
+    return PreparedInlineKeyboardMarkup(buttons)
 
 
 def get_saved_addresses_keyboard(addresses: List[str]) -> InlineKeyboardMarkup:
     """Keyboard with saved addresses and option to add new"""
-    buttons = []
-    for i, address in enumerate(addresses[:5]):  # Max 5 addresses
-        short_address = address[:35] + "..." if len(address) > 35 else address
-        buttons.append([InlineKeyboardButton(f"📍 {short_address}", callback_data=f"use_address_{i}")])
-    buttons.append([InlineKeyboardButton("➕ Новый адрес", callback_data="new_address")])
-    buttons.append([InlineKeyboardButton("⬅️ Назад", callback_data="back_to_checkout")])
-    return InlineKeyboardMarkup(buttons)
+    return _saved_addresses_keyboard(tuple(islice(addresses, 5)))  # Max 5 addresses
 
 
+@lru_cache(maxsize=256)
+def _saved_addresses_keyboard(addresses: Tuple[str, ...]) -> InlineKeyboardMarkup:
+    """Saved addresses keyboard, built once per address list"""
+    buttons = [
+        (InlineKeyboardButton(f"📍 {truncate(a, 35, '...')}", callback_data=f"use_address_{i}"),)
+        for i, a in enumerate(addresses)
+    ]
+    buttons.append((InlineKeyboardButton("➕ Новый адрес", callback_data="new_address"),))
+    buttons.append((InlineKeyboardButton("⬅️ Назад", callback_data="back_to_checkout"),))
+    return PreparedInlineKeyboardMarkup(buttons)
+
+
+@lru_cache(maxsize=None)
 def get_phone_request_keyboard() -> ReplyKeyboardMarkup:
     """Keyboard for phone number request"""
     keyboard = [
         [KeyboardButton("📱 Отправить номер телефона", request_contact=True)],
         [KeyboardButton("⬅️ Отмена")]
     ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
+    return PreparedReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
 
 
 # ==================== Orders ====================
+_ORDERS_BACK_ROW = (InlineKeyboardButton("⬅️ Назад", callback_data="back_to_main"),)
+
+
 def get_order_list_keyboard(orders: List[Dict]) -> InlineKeyboardMarkup:
     """Keyboard with user's orders"""
-    buttons = []
-    for order in orders[:10]:  # Show last 10 orders
-        status_emoji = get_status_emoji(order['status'])
-        buttons.append([InlineKeyboardButton(
-            f"{status_emoji} Заказ #{order['id']} - {order['total']}₽",
-            callback_data=f"view_order_{order['id']}"
-        )])
-    buttons.append([InlineKeyboardButton("⬅️ Назад", callback_data="back_to_main")])
-    return InlineKeyboardMarkup(buttons)
+    # Keyed on what the buttons show, so repeat views reuse the markup until an order changes
+    shown = islice(orders, 10)  # Show last 10 orders
+    return _order_list_keyboard(tuple((o['id'], o['status'], o['total']) for o in shown))
+
+
+@lru_cache(maxsize=1024)
+def _order_list_keyboard(orders: Tuple[tuple, ...]) -> InlineKeyboardMarkup:
+    """Order list keyboard for (id, status, total) entries"""
+    buttons = [
+        (InlineKeyboardButton(
+            f"{STATUS_EMOJIS.get(status, UNKNOWN_STATUS_EMOJI)} Заказ #{order_id} - {total}₽",
+            callback_data=f"view_order_{order_id}"
+        ),)
+        for order_id, status, total in orders
+    ]
+    buttons.append(_ORDERS_BACK_ROW)
+    return PreparedInlineKeyboardMarkup(buttons)
+
 
+# Customer action offered per order status: (label, callback prefix), None for no action
+CANCEL_ORDER_ACTION = ("❌ Отменить заказ", "cancel_order")
+ORDER_ACTIONS = {
+    'delivered': ("🔄 Повторить заказ", "reorder"),
+    'on_the_way': None,
+    'cancelled': None,
+}
+_ORDER_LIST_BACK_ROW = (InlineKeyboardButton("⬅️ К списку заказов", callback_data="back_to_orders"),)
 
+
+@lru_cache(maxsize=256)
 def get_order_detail_keyboard(order_id: int, status: str) -> InlineKeyboardMarkup:
     """Keyboard for order detail view"""
+    action = ORDER_ACTIONS.get(status, CANCEL_ORDER_ACTION)
     buttons = []
-    if status == 'delivered':
-        buttons.append([InlineKeyboardButton("🔄 Повторить заказ", callback_data=f"reorder_{order_id}")])
-    elif status not in ('cancelled', 'on_the_way', 'delivered'):
-        buttons.append([InlineKeyboardButton("❌ Отменить заказ", callback_data=f"cancel_order_{order_id}")])
-    buttons.append([InlineKeyboardButton("⬅️ К списку заказов", callback_data="back_to_orders")])
-    return InlineKeyboardMarkup(buttons)
+    if action:
+        label, prefix = action
+        buttons.append((InlineKeyboardButton(label, callback_data=f"{prefix}_{order_id}"),))
+    buttons.append(_ORDER_LIST_BACK_ROW)
+    return PreparedInlineKeyboardMarkup(buttons)
 
 
 # ==================== Admin ====================
 def get_admin_orders_keyboard(orders: List[Dict]) -> InlineKeyboardMarkup:
     """Admin keyboard for order management"""
-    buttons = []
-    for order in orders[:15]:  # Show first 15 pending orders
-        status_emoji = get_status_emoji(order['status'])
-        buttons.append([InlineKeyboardButton(
-            f"{status_emoji} #{order['id']} - {order['total']}₽",
-            callback_data=f"admin_order_{order['id']}"
-        )])
-    return InlineKeyboardMarkup(buttons)
+    buttons = [
+        (InlineKeyboardButton(
+            f"{STATUS_EMOJIS.get(o['status'], UNKNOWN_STATUS_EMOJI)} #{o['id']} - {o['total']}₽",
+            callback_data=f"admin_order_{o['id']}"
+        ),)
+        for o in islice(orders, 15)  # Show first 15 pending orders
+    ]
+    return PreparedInlineKeyboardMarkup(buttons)
+
+
+ADMIN_STATUS_CHOICES = (
+    ('new', '🆕 Новый'),
+    ('accepted', '✅ Принят'),
+    ('preparing', '👨‍🍳 Готовится'),
+    ('on_the_way', '🚗 В пути'),
+    ('delivered', '📦 Доставлен'),
+    ('cancelled', '❌ Отменён')
+)
+
+# current status -> statuses an admin can switch the order to
+ADMIN_STATUS_TARGETS = {
+    current: tuple(choice for choice in ADMIN_STATUS_CHOICES if choice[0] != current)
+    for current, _ in ADMIN_STATUS_CHOICES
+}
 
 
+@lru_cache(maxsize=256)
 def get_admin_order_status_keyboard(order_id: int, current_status: str) -> InlineKeyboardMarkup:
     """Keyboard for changing order status"""
-    statuses = [
-        ('new', '🆕 Новый'),
-        ('accepted', '✅ Принят'),
-        ('preparing', '👨‍🍳 Готовится'),
-        ('on_the_way', '🚗 В пути'),
-        ('delivered', '📦 Доставлен'),
-        ('cancelled', '❌ Отменён')
+    buttons = [
+        (InlineKeyboardButton(status_name, callback_data=f"set_status_{order_id}_{status_code}"),)
+        for status_code, status_name in ADMIN_STATUS_TARGETS.get(current_status, ADMIN_STATUS_CHOICES)
     ]
-    
-    buttons = []
-    for status_code, status_name in statuses:
-        if status_code != current_status:
-            buttons.append([InlineKeyboardButton(
-                status_name,
-                callback_data=f"set_status_{order_id}_{status_code}"
-            )])
-    buttons.append([InlineKeyboardButton("⬅️ Назад", callback_data="admin_back_to_orders")])
-    return InlineKeyboardMarkup(buttons)
+    buttons.append((InlineKeyboardButton("⬅️ Назад", callback_data="admin_back_to_orders"),))
+    return PreparedInlineKeyboardMarkup(buttons)
 
 
 def get_admin_product_list_keyboard(products: List[Dict]) -> InlineKeyboardMarkup:
     """Admin keyboard for product management"""
-    buttons = []
-    for product in products[:15]:
-        available = "✅" if product.get('available', True) else "❌"
-        buttons.append([InlineKeyboardButton(
-            f"{available} {product['name']} - {product['price']}₽",
-            callback_data=f"admin_product_{product['id']}"
-        )])
-    buttons.append([InlineKeyboardButton("➕ Добавить товар", callback_data="admin_add_product")])
-    buttons.append([InlineKeyboardButton("⬅️ Назад", callback_data="admin_back")])
-    return InlineKeyboardMarkup(buttons)
+    buttons = [
+        (InlineKeyboardButton(
+            f"{'✅' if p.get('available', True) else '❌'} {p['name']} - {p['price']}₽",
+            callback_data=f"admin_product_{p['id']}"
+        ),)
+        for p in islice(products, 15)
+    ]
+    buttons.append((InlineKeyboardButton("➕ Добавить товар", callback_data="admin_add_product"),))
+    buttons.append((InlineKeyboardButton("⬅️ Назад", callback_data="admin_back"),))
+    return PreparedInlineKeyboardMarkup(buttons)
+
+
+_ADMIN_PRODUCTS_BACK_ROW = (InlineKeyboardButton("⬅️ Назад", callback_data="admin_products"),)
 
 
+@lru_cache(maxsize=256)
 def get_admin_product_actions_keyboard(product_id: int, is_available: bool) -> InlineKeyboardMarkup:
     """Admin keyboard for product actions"""
-    buttons = [
-        [InlineKeyboardButton("✏️ Изменить цену", callback_data=f"admin_edit_price_{product_id}")],
-        [InlineKeyboardButton("📝 Изменить описание", callback_data=f"admin_edit_desc_{product_id}")]
-    ]
     if is_available:
-        buttons.append([InlineKeyboardButton("🚫 Скрыть товар", callback_data=f"admin_hide_{product_id}")])
+        visibility = InlineKeyboardButton("🚫 Скрыть товар", callback_data=f"admin_hide_{product_id}")
     else:
-        buttons.append([InlineKeyboardButton("✅ Показать товар", callback_data=f"admin_show_{product_id}")])
-    buttons.append([InlineKeyboardButton("⬅️ Назад", callback_data="admin_products")])
-    return InlineKeyboardMarkup(buttons)
+        visibility = InlineKeyboardButton("✅ Показать товар", callback_data=f"admin_show_{product_id}")
+    return PreparedInlineKeyboardMarkup((
+        (InlineKeyboardButton("✏️ Изменить цену", callback_data=f"admin_edit_price_{product_id}"),),
+        (InlineKeyboardButton("📝 Изменить описание", callback_data=f"admin_edit_desc_{product_id}"),),
+        (visibility,),
+        _ADMIN_PRODUCTS_BACK_ROW
+    ))
 
 
+@lru_cache(maxsize=256)
 def get_confirm_keyboard(action: str) -> InlineKeyboardMarkup:
     """Generic confirmation keyboard"""
     buttons = [
@@ -254,36 +366,46 @@ def get_confirm_keyboard(action: str) -> InlineKeyboardMarkup:
             InlineKeyboardButton("❌ Нет", callback_data=f"cancel_{action}")
         ]
     ]
-    return InlineKeyboardMarkup(buttons)
+    return PreparedInlineKeyboardMarkup(buttons)
 
 
 # ==================== Utilities ====================
+STATUS_EMOJIS = {
+    'new': '🆕',
+    'accepted': '✅',
+    'preparing': '👨‍🍳',
+    'on_the_way': '🚗',
+    'delivered': '📦',
+    'cancelled': '❌'
+}
+UNKNOWN_STATUS_EMOJI = '❓'
+
+STATUS_TEXTS = {
+    'new': 'Новый',
+    'accepted': 'Принят',
+    'preparing': 'Готовится',
+    'on_the_way': 'В пути',
+    'delivered': 'Доставлен',
+    'cancelled': 'Отменён'
+}
+UNKNOWN_STATUS_TEXT = 'Неизвестно'
+
+# status -> (emoji, text) for one lookup per render
+STATUS_VIEWS = {status: (emoji, STATUS_TEXTS[status]) for status, emoji in STATUS_EMOJIS.items()}
+UNKNOWN_STATUS_VIEW = (UNKNOWN_STATUS_EMOJI, UNKNOWN_STATUS_TEXT)
+
+
 def get_status_emoji(status: str) -> str:
     """Get emoji for order status"""
-    status_emojis = {
-        'new': '🆕',
-        'accepted': '✅',
-        'preparing': '👨‍🍳',
-        'on_the_way': '🚗',
-        'delivered': '📦',
-        'cancelled': '❌'
-    }
-    return status_emojis.get(status, '❓')
+    return STATUS_EMOJIS.get(status, UNKNOWN_STATUS_EMOJI)
 
 
 def get_status_text(status: str) -> str:
     """Get Russian text for order status"""
-    status_texts = {
-        'new': 'Новый',
-        'accepted': 'Принят',
-        'preparing': 'Готовится',
-        'on_the_way': 'В пути',
-        'delivered': 'Доставлен',
-        'cancelled': 'Отменён'
-    }
-    return status_texts.get(status, 'Неизвестно')
+    return STATUS_TEXTS.get(status, UNKNOWN_STATUS_TEXT)
 
 
+@lru_cache(maxsize=256)
 def get_back_keyboard(callback_data: str = "back_to_main") -> InlineKeyboardMarkup:
     """Simple back button keyboard"""
-    return InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ Назад", callback_data=callback_data)]])
+    return PreparedInlineKeyboardMarkup([[InlineKeyboardButton("⬅️ Назад", callback_data=callback_data)]])